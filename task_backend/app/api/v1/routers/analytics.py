@@ -5,6 +5,7 @@ High-performance analytics endpoints
 from fastapi import APIRouter, Query, HTTPException
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
+import asyncio
 import logging
 import math
 
@@ -51,7 +52,9 @@ async def get_reporting_manager_overview(
 ):
     """Reporting Manager analytics overview (ClickHouse-first)"""
     try:
-        ch_result = clickhouse_service.get_reporting_manager_overview(days=days, limit_employees=limit_employees)
+        ch_result = await asyncio.to_thread(
+            clickhouse_service.get_reporting_manager_overview, days=days, limit_employees=limit_employees
+        )
         managers = ch_result.get("managers", [])
         employees = ch_result.get("employees", [])
 
@@ -146,7 +149,7 @@ async def get_task_performance(
 ):
     """Get task performance analytics (100x faster with ClickHouse)"""
     try:
-        analytics = clickhouse_service.get_task_analytics(days=days, stage=stage)
+        analytics = await asyncio.to_thread(clickhouse_service.get_task_analytics, days=days, stage=stage)
         
         return {
             "success": True,
@@ -165,7 +168,7 @@ async def get_top_performers(
 ):
     """Get top performing employees"""
     try:
-        performers = clickhouse_service.get_employee_performance(days=days, limit=limit)
+        performers = await asyncio.to_thread(clickhouse_service.get_employee_performance, days=days, limit=limit)
         
         return {
             "success": True,
@@ -183,7 +186,7 @@ async def get_sla_compliance(
 ):
     """Get SLA compliance analytics"""
     try:
-        sla_data = clickhouse_service.get_sla_analytics(days=days)
+        sla_data = await asyncio.to_thread(clickhouse_service.get_sla_analytics, days=days)
         
         return {
             "success": True,
@@ -201,7 +204,7 @@ async def get_realtime_metrics(
 ):
     """Get real-time dashboard metrics"""
     try:
-        metrics = clickhouse_service.get_real_time_metrics(hours=hours)
+        metrics = await asyncio.to_thread(clickhouse_service.get_real_time_metrics, hours=hours)
         
         return {
             "success": True,
@@ -236,11 +239,13 @@ async def sync_mongodb_to_clickhouse(
 async def get_dashboard_overview():
     """Complete dashboard overview with ClickHouse speed"""
     try:
-        # Get all metrics in parallel
-        task_analytics = clickhouse_service.get_task_analytics(days=7)
-        top_performers = clickhouse_service.get_employee_performance(days=7, limit=5)
-        sla_compliance = clickhouse_service.get_sla_analytics(days=7)
-        realtime_metrics = clickhouse_service.get_real_time_metrics(hours=1)
+        # Get all metrics in parallel (worker threads, each on its own pooled connection)
+        task_analytics, top_performers, sla_compliance, realtime_metrics = await asyncio.gather(
+            asyncio.to_thread(clickhouse_service.get_task_analytics, days=7),
+            asyncio.to_thread(clickhouse_service.get_employee_performance, days=7, limit=5),
+            asyncio.to_thread(clickhouse_service.get_sla_analytics, days=7),
+            asyncio.to_thread(clickhouse_service.get_real_time_metrics, hours=1),
+        )
         
         return {
             "success": True,
@@ -101,7 +101,7 @@ async def auto_assign_task(
         
         # Generate embedding using existing service
         embedding_service = get_embedding_service()
-        task_embedding = embedding_service.generate_embedding(task_description)
+        task_embedding = await embedding_service.generate_embedding_async(task_description)
         
         # Create task following existing structure from tasks.py
         task_document = {
@@ -98,7 +98,7 @@ async def get_task_recommendations(request: TaskRecommendationRequest) -> Recomm
                     location_source = "permit_file"
         
         # Get optimized recommendations
-        recommendations = engine.get_recommendations(
+        recommendations = await engine.get_recommendations_async(
             task_description=request.task_description,
             top_k=request.top_k,
             min_score=request.min_similarity,
@@ -177,7 +177,7 @@ async def test_embedding_generation(text: str) -> Dict[str, Any]:
     """
     try:
         engine = get_recommendation_engine()
-        embedding = engine.embedding_service.generate_embedding(text)
+        embedding = await engine.embedding_service.generate_embedding_async(text)
         
         return {
             "text": text,
@@ -1166,7 +1166,7 @@ async def smart_upload_and_assign(
                 except Exception as e:
                     logger.warning(f"Failed to get file stage for {file_id}: {e}")
                 
-                recs = engine.get_recommendations(
+                recs = await engine.get_recommendations_async(
                     task_description=task_description,
                     team_lead_code=locked_lead,
                     top_k=1,
@@ -20,7 +20,8 @@ from app.models.file_stage_tracking import (
     StageCompletionRequest, FileTracking
 )
 from app.utils.api_response import APIResponse
-from app.services.stage_tracking_service import get_stage_tracking_service, _parse_file_tracking_safely, convert_objectid_to_str
+from app.services.stage_tracking_service import get_stage_tracking_service, _parse_file_tracking_safely
+from app.utils.serialization import convert_objectid_to_str
 from app.db.mongodb import get_db
 
 
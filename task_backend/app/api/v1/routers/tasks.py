@@ -362,7 +362,7 @@ async def create_task(task_data: TaskCreateMySQL):
     
     # Generate embedding for task description
     embedding_service = get_embedding_service()
-    task_embedding = embedding_service.generate_embedding(task_text)
+    task_embedding = await embedding_service.generate_embedding_async(task_text)
     
     # Determine SLA eligibility (only for file-based tracking)
     sla_applicable = bool(resolved_task_data.file_id and resolved_task_data.file_id.strip())
@@ -697,7 +697,7 @@ async def get_task_recommendations(request: TaskRecommendationRequest) -> Recomm
                     logger.info(f"Resolved team lead from file {effective_permit_file_id}: {resolved_team_lead_code} ({resolved_team_lead_name})")
         
         logger.info(f"[RECOMMEND-ENGINE] Calling recommendation engine with team_lead={resolved_team_lead_code}, top_k={request.top_k}")
-        recommendations = engine.get_recommendations(
+        recommendations = await engine.get_recommendations_async(
             task_description=resolved_request.task_description,
             top_k=resolved_request.top_k,
             min_score=resolved_request.min_similarity,
@@ -945,7 +945,8 @@ async def assign_task(task_id: str, assignment: TaskAssign):
                     employee_name=employee_name,
                     assigned_by=resolved_assignment.assigned_by,
                     file_id_param=task.get("file_id"),
-                    tracking_mode=task.get("tracking_mode")
+                    tracking_mode=task.get("tracking_mode"),
+                    task_name=task.get("title", "")
                 ))
                 logger.info(f"[CLICKHOUSE-EVENT-TASK] Emitting task_assigned event for {task_id}")
         except Exception as e:
@@ -1019,7 +1020,8 @@ async def start_task(task_id: str, employee_code: str = Query(...)):
                     employee_name=employee_code,  # Can't easily get name here without extra DB call, but that's okay
                     stage=task.get("stage", "UNKNOWN"),
                     file_id_param=task.get("file_id"),
-                    tracking_mode=task.get("tracking_mode")
+                    tracking_mode=task.get("tracking_mode"),
+                    task_name=task.get("title", "")
                 ))
                 logger.info(f"[CLICKHOUSE-EVENT-TASK] Emitting task_started event for {task_id}")
         except Exception as e:
@@ -254,9 +254,8 @@ def _pick_any_employee_under_lead(team_lead: str) -> Optional[Dict[str, Any]]:
     employees = engine.load_employees(team_lead)
     if not employees:
         return None
-    # Sort by active task count, then by experience
-    employees.sort(key=lambda e: (e.get("active_task_count", 0), e.get("experience_years", 0)))
-    chosen = employees[0]
+    # Least active task count, then least experience (the list is the engine's cache: don't reorder it)
+    chosen = min(employees, key=lambda e: (e.get("active_task_count", 0), e.get("experience_years", 0)))
     logger.info(f"[ZIP ASSIGN] Picked employee {chosen['employee_name']} ({chosen['employee_code']}) under lead {team_lead}")
     return chosen
 
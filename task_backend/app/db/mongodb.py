@@ -6,13 +6,18 @@ from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure
 from app.core.settings import settings
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between pool health-check pings in get_db()
+HEALTH_CHECK_INTERVAL_SECONDS = 30
+
 class MongoDBConnection:
     """Singleton MongoDB connection pool"""
     _instance = None
     _client = None
+    _last_health_check = 0.0
     
     def __new__(cls):
         if cls._instance is None:
@@ -53,24 +58,43 @@ class MongoDBConnection:
         if self._client is None:
             self._connect()
         return self._db
-        return self._client[settings.mongodb_db]
+    
+    def get_client(self) -> MongoClient:
+        """Get the shared MongoClient (and its connection pool)"""
+        if self._client is None:
+            self._connect()
+        return self._client
     
     def close(self):
         """Close MongoDB connection"""
         if self._client:
             self._client.close()
             self._client = None
+            self._last_health_check = 0.0
             logger.info("MongoDB connection closed")
 
 # Singleton instance
 _mongo_connection = MongoDBConnection()
 
+def get_client() -> MongoClient:
+    """Get the process-wide MongoClient so callers share one connection pool"""
+    return _mongo_connection.get_client()
+
+
+def close_db():
+    """Close the shared MongoDB connection pool"""
+    _mongo_connection.close()
+
+
 def get_db():
     """Get MongoDB database instance with connection pooling and health check"""
     try:
         db = _mongo_connection.get_database()
-        # Health check - ping the database
-        db.command('ping')
+        # Health check - ping the database at most once per interval
+        now = time.monotonic()
+        if now - _mongo_connection._last_health_check >= HEALTH_CHECK_INTERVAL_SECONDS:
+            db.command('ping')
+            _mongo_connection._last_health_check = now
         return db
     except Exception as e:
         logger.warning(f"MongoDB health check failed, attempting reconnect: {str(e)}")
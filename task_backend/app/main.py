@@ -2,7 +2,7 @@ from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.settings import settings
-from pymongo import MongoClient
+from app.db.mongodb import get_client, close_db
 import logging
 import asyncio
 
@@ -66,6 +66,44 @@ app.add_middleware(
 # Create uploads directory
 Path(settings.uploads_dir).mkdir(parents=True, exist_ok=True)
 
+# Collections whose document counts are reported on startup
+STARTUP_COUNT_COLLECTIONS = ("employee", "tasks", "profile_building", "permit_files")
+
+
+def _get_startup_counts(db) -> dict:
+    """
+    Fetch startup collection counts in one aggregation.
+
+    Each collection contributes its metadata count via $collStats, merged with
+    $unionWith, plus the filtered count of employees that have embeddings.
+    """
+    def collection_count_stages(name: str) -> list:
+        return [
+            {"$collStats": {"count": {}}},
+            {"$project": {"_id": 0, "coll": {"$literal": name}, "count": 1}},
+        ]
+
+    first, *rest = STARTUP_COUNT_COLLECTIONS
+    pipeline = collection_count_stages(first)
+    for name in rest:
+        pipeline.append({"$unionWith": {"coll": name, "pipeline": collection_count_stages(name)}})
+    pipeline.append({"$unionWith": {"coll": "employee", "pipeline": [
+        {"$match": {"embedding": {"$exists": True, "$ne": []}}},
+        {"$count": "count"},
+        {"$project": {"coll": {"$literal": "employee_embeddings"}, "count": 1}},
+    ]}})
+    # Sharded collections report one $collStats document per shard
+    pipeline.append({"$group": {"_id": "$coll", "count": {"$sum": "$count"}}})
+
+    try:
+        return {doc["_id"]: doc["count"] for doc in db[first].aggregate(pipeline)}
+    except Exception as e:
+        logger.warning(f"Startup count aggregation failed, falling back to per-collection counts: {e}")
+        counts = {name: db[name].estimated_document_count() for name in STARTUP_COUNT_COLLECTIONS}
+        counts["employee_embeddings"] = db.employee.count_documents({'embedding': {'$exists': True, '$ne': []}})
+        return counts
+
+
 # MongoDB initialization and connection check
 @app.on_event("startup")
 async def startup_event():
@@ -78,28 +116,32 @@ async def startup_event():
         logger.info(f"   URI: {settings.mongodb_uri[:30]}...")
         logger.info(f"   Database: {settings.mongodb_db}")
         
-        # Test MongoDB connection
-        client = MongoClient(settings.mongodb_uri, serverSelectionTimeoutMS=5000)
+        # Test MongoDB connection on the shared pool used by all services
+        client = get_client()
         client.admin.command('ping')
+        app.state.mongo = client
         db = client[settings.mongodb_db]
         
-        # Get collection counts
-        employee_count = db.employee.count_documents({})
-        tasks_count = db.tasks.count_documents({})
-        profile_count = db.profile_building.count_documents({})
-        permit_count = db.permit_files.count_documents({})
+        # Get collection counts (single aggregation round trip)
+        counts = _get_startup_counts(db)
+        employee_count = counts.get('employee', 0)
         
         logger.info("✅ MongoDB connection successful!")
         logger.info(f"📋 Collections status:")
-        logger.info(f"   • employee: {employee_count} documents")
-        logger.info(f"   • tasks: {tasks_count} documents")
-        logger.info(f"   • profile_building: {profile_count} documents")
-        logger.info(f"   • permit_files: {permit_count} documents")
+        for collection_name in STARTUP_COUNT_COLLECTIONS:
+            logger.info(f"   • {collection_name}: {counts.get(collection_name, 0)} documents")
         
         # Check embeddings
-        with_embeddings = db.employee.count_documents({'embedding': {'$exists': True, '$ne': []}})
+        with_embeddings = counts.get('employee_embeddings', 0)
         logger.info(f"🎯 Embeddings: {with_embeddings}/{employee_count} employees")
         
+        # Indexes for duplicate detection on permit_files
+        try:
+            from app.services.file_deduplication_service import FileDeduplicationService
+            FileDeduplicationService.ensure_indexes()
+        except Exception as e:
+            logger.warning(f"⚠️  Failed to ensure permit_files indexes: {e}")
+        
         # Start MongoDB to ClickHouse sync service
         from app.services.sync_service import SyncService
         sync_service = SyncService()
@@ -146,8 +188,6 @@ async def startup_event():
         logger.info("="*60)
         logger.info("✅ BACKEND READY - MongoDB + ClickHouse Mode")
         logger.info("="*60)
-        
-        client.close()
     except Exception as e:
         logger.error("="*60)
         logger.error("❌ MONGODB CONNECTION FAILED!")
@@ -164,8 +204,14 @@ async def shutdown_event():
         sla_emitter = get_sla_emitter()
         await sla_emitter.stop()
         logger.info("✅ Stopped SLA event emitter")
+        
+        # Write ClickHouse task events still waiting in the queue
+        from app.services.clickhouse_service import clickhouse_service
+        await clickhouse_service.stop_event_flusher()
     except Exception as e:
         logger.error(f"Error during shutdown: {e}")
+    finally:
+        close_db()
 
 # Import and include routers - MongoDB based
 from app.api.v1.routers.employees import router as employees_router
@@ -8,6 +8,7 @@ from pydantic import BaseModel, Field
 from bson import ObjectId
 
 from app.models.stage_flow import FileStage, calculate_sla_status, calculate_penalty
+from app.utils.serialization import convert_objectid_to_str
 
 
 class StageAssignment(BaseModel):
@@ -24,7 +25,6 @@ class StageAssignment(BaseModel):
     
     def model_dump(self, **kwargs) -> Dict[str, Any]:
         """Custom model_dump method to handle ObjectId serialization"""
-        from app.services.stage_tracking_service import convert_objectid_to_str
         result = super().model_dump(**kwargs)
         return convert_objectid_to_str(result)
     
@@ -49,7 +49,6 @@ class FileStageHistory(BaseModel):
     
     def model_dump(self, **kwargs) -> Dict[str, Any]:
         """Custom model_dump method to handle ObjectId serialization"""
-        from app.services.stage_tracking_service import convert_objectid_to_str
         result = super().model_dump(**kwargs)
         return convert_objectid_to_str(result)
     
@@ -83,7 +82,6 @@ class FileTracking(BaseModel):
     
     def model_dump(self, **kwargs) -> Dict[str, Any]:
         """Custom model_dump method to handle ObjectId serialization"""
-        from app.services.stage_tracking_service import convert_objectid_to_str
         result = super().model_dump(**kwargs)
         return convert_objectid_to_str(result)
     
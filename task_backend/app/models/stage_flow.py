@@ -1,8 +1,9 @@
 """
 Stage flow definitions and SLA rules
 """
+from bisect import bisect_left
 from enum import Enum
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 
@@ -81,6 +82,30 @@ STAGE_CONFIGS: Dict[FileStage, StageConfig] = {
 }
 
 
+# SLA status names, ordered by severity (index = number of thresholds exceeded)
+SLA_STATUS_NAMES: Tuple[str, ...] = ("within_ideal", "over_ideal", "over_max", "escalation_needed")
+
+
+def _build_sla_thresholds(config: StageConfig) -> Tuple[int, int, int]:
+    """
+    Flatten a stage's (ideal, max, escalation) limits into a sorted tuple for bisect.
+
+    Each limit is clamped to the smallest limit that follows it, because a more
+    severe status always wins (e.g. PRODUCTION escalates at 60 min even though
+    its ideal is 210 min).
+    """
+    limits = [config.ideal_minutes, config.max_minutes, config.escalation_minutes]
+    for i in range(len(limits) - 2, -1, -1):
+        limits[i] = min(limits[i], limits[i + 1])
+    return tuple(limits)
+
+
+# Precomputed per-stage SLA thresholds as plain int tuples
+STAGE_SLA_BOUNDS: Dict[FileStage, Tuple[int, int, int]] = {
+    stage: _build_sla_thresholds(config) for stage, config in STAGE_CONFIGS.items()
+}
+
+
 def get_stage_config(stage: FileStage) -> StageConfig:
     """Get configuration for a stage"""
     return STAGE_CONFIGS.get(stage)
@@ -133,16 +158,11 @@ def calculate_sla_status(start_time, end_time, stage: FileStage) -> Dict:
     duration = (end_time or datetime.utcnow()) - start_time
     duration_minutes = int(duration.total_seconds() / 60)
     
-    status = "within_ideal"
-    if duration_minutes > config.ideal_minutes:
-        status = "over_ideal"
-    if duration_minutes > config.max_minutes:
-        status = "over_max"
-    if duration_minutes > config.escalation_minutes:
-        status = "escalation_needed"
+    # Number of thresholds strictly exceeded selects the status
+    status_index = bisect_left(STAGE_SLA_BOUNDS[stage], duration_minutes)
     
     return {
-        "status": status,
+        "status": SLA_STATUS_NAMES[status_index],
         "duration_minutes": duration_minutes,
         "ideal_minutes": config.ideal_minutes,
         "max_minutes": config.max_minutes,
@@ -7,11 +7,16 @@ from typing import Any, Optional, Dict
 import logging
 from functools import wraps
 import hashlib
-import json
+import inspect
 import threading
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
+# Sorted-key serialization options for cache keys (sorting is done in orjson, not Python)
+_CACHE_KEY_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+
 
 class SimpleCache:
     """Thread-safe in-memory cache with TTL"""
@@ -71,12 +76,8 @@ def get_cache() -> SimpleCache:
 
 def cache_key(*args, **kwargs) -> str:
     """Generate cache key from function arguments"""
-    key_data = {
-        'args': args,
-        'kwargs': kwargs
-    }
-    key_str = json.dumps(key_data, sort_keys=True, default=str)
-    return hashlib.md5(key_str.encode()).hexdigest()
+    key_bytes = orjson.dumps((args, kwargs), default=str, option=_CACHE_KEY_OPTIONS)
+    return hashlib.md5(key_bytes).hexdigest()
 
 
 def cached(ttl_seconds: int = 60, key_prefix: str = ""):
@@ -117,3 +118,82 @@ def cached(ttl_seconds: int = 60, key_prefix: str = ""):
         
         return wrapper
     return decorator
+
+
+# Argument types keyed directly by type name and repr(); other types use the generic key.
+# The type tag keeps 1, "1" and True apart, and repr() quotes strings, so a ":" inside
+# a value cannot shift the boundary between two key parts.
+_SCALAR_KEY_TYPES = (str, int, float, bool, type(None))
+
+
+def cached_by(ttl_seconds: int = 60, *, arg_names: tuple, key_prefix: str = ""):
+    """
+    Decorator to cache function results keyed only by the named scalar arguments
+    
+    The argument positions are resolved once at decoration time, so a call
+    builds its key as "prefix:str='a':int=1" without serializing or hashing.
+    Only the named arguments identify the cached entry. Functions whose
+    signature cannot be resolved this way use the generic `cached` decorator.
+    
+    Args:
+        ttl_seconds: Time to live in seconds (default: 60)
+        arg_names: Names of the arguments that identify a cached result
+        key_prefix: Prefix for cache key (default: function name)
+    """
+    def decorator(func):
+        try:
+            parameters = list(inspect.signature(func).parameters.values())
+        except (TypeError, ValueError):
+            return cached(ttl_seconds, key_prefix)(func)
+        
+        positional_kinds = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+        by_name = {param.name: (index, param) for index, param in enumerate(parameters)}
+        key_args = []
+        for name in arg_names:
+            if name not in by_name:
+                return cached(ttl_seconds, key_prefix)(func)
+            index, param = by_name[name]
+            if param.kind not in positional_kinds and param.kind != inspect.Parameter.KEYWORD_ONLY:
+                return cached(ttl_seconds, key_prefix)(func)
+            position = index if param.kind in positional_kinds else None
+            default = None if param.default is inspect.Parameter.empty else param.default
+            key_args.append((name, position, default))
+        
+        prefix = key_prefix or func.__name__
+        
+        def build_key(args, kwargs) -> str:
+            parts = [prefix]
+            for name, position, default in key_args:
+                if name in kwargs:
+                    value = kwargs[name]
+                elif position is not None and position < len(args):
+                    value = args[position]
+                else:
+                    value = default
+                if not isinstance(value, _SCALAR_KEY_TYPES):
+                    # Non-scalar value: fall back to the generic serialized key
+                    return f"{prefix}:{cache_key(*args, **kwargs)}"
+                parts.append(f"{type(value).__name__}={value!r}")
+            return ":".join(parts)
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = build_key(args, kwargs)
+            
+            cached_value = _cache.get(key)
+            if cached_value is not None:
+                logger.debug(f"Cache HIT: {prefix}")
+                return cached_value
+            
+            logger.debug(f"Cache MISS: {prefix}")
+            result = func(*args, **kwargs)
+            _cache.set(key, result, ttl_seconds)
+            
+            return result
+        
+        # Add cache control methods
+        wrapper.cache_clear = lambda: _cache.clear()
+        wrapper.cache_delete = lambda *args, **kwargs: _cache.delete(build_key(args, kwargs))
+        
+        return wrapper
+    return decorator
@@ -1,55 +1,377 @@
 """
 Enhanced ClickHouse service for comprehensive file lifecycle tracking
 """
-import json
-import uuid
+import atexit
+import itertools
+import operator
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union
+
+import orjson
+from clickhouse_driver.errors import ServerException, TypeMismatchError
 from app.services.clickhouse_service import CLICKHOUSE_ENABLED, clickhouse_service
+from app.services.cache_service import cached
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Batched insert tuning for lifecycle tables
+LIFECYCLE_FLUSH_INTERVAL_SECONDS = 1.0
+LIFECYCLE_MAX_BATCH_ROWS = 1000
+
+# ReplacingMergeTree tables: only the newest queued row per key needs to be sent
+LIFECYCLE_MERGE_KEYS = {
+    'file_lifecycle': 'file_id',
+}
+
+# Columns written per lifecycle table, in INSERT order. Queued rows are tuples in
+# this order; columns left out (e.g. created_at) use their server-side DEFAULT
+LIFECYCLE_INSERT_COLUMNS = {
+    'file_lifecycle_events': (
+        'event_id', 'file_id', 'event_type', 'stage', 'employee_code', 'employee_name',
+        'event_time', 'event_data', 'previous_stage', 'next_stage', 'duration_minutes',
+    ),
+    'file_lifecycle': (
+        'file_id', 'current_stage', 'current_status', 'uploaded_at', 'sla_deadline', 'last_updated',
+    ),
+    'file_current_state': (
+        'file_id', 'current_stage', 'current_status', 'current_employee_code', 'current_employee_name',
+        'last_updated', 'total_duration_minutes', 'stage_started_at',
+    ),
+}
+
+# Explicit column lists spare the driver a per-INSERT table structure lookup
+LIFECYCLE_INSERT_SQL = {
+    table: f"INSERT INTO task_analytics.{table} ({', '.join(columns)}) VALUES"
+    for table, columns in LIFECYCLE_INSERT_COLUMNS.items()
+}
+
+# Turn a row dict into a tuple in LIFECYCLE_INSERT_COLUMNS order
+LIFECYCLE_ROW_GETTERS = {
+    table: operator.itemgetter(*columns)
+    for table, columns in LIFECYCLE_INSERT_COLUMNS.items()
+}
+
+# Table ORDER BY keys: rows are pre-sorted so ClickHouse can skip sorting new parts
+LIFECYCLE_SORT_COLUMNS = {
+    'file_lifecycle_events': ('file_id', 'event_time', 'event_type'),
+    'file_lifecycle': ('file_id',),
+    'file_current_state': ('file_id',),
+}
+LIFECYCLE_SORT_KEYS = {
+    table: operator.itemgetter(*(LIFECYCLE_INSERT_COLUMNS[table].index(column) for column in columns))
+    for table, columns in LIFECYCLE_SORT_COLUMNS.items()
+}
+
+# file_current_state columns (besides file_id/last_updated) and the values used
+# when a state update does not set them
+FILE_CURRENT_STATE_DEFAULTS = {
+    'current_stage': '',
+    'current_status': '',
+    'current_employee_code': '',
+    'current_employee_name': '',
+    'total_duration_minutes': 0,
+    'stage_started_at': None,
+}
+
+# Columns read back from file_current_state when a file's state is not cached
+CURRENT_STATE_SELECT_COLUMNS = (
+    'current_stage',
+    'current_status',
+    'current_employee_code',
+    'current_employee_name',
+    'total_duration_minutes',
+    'stage_started_at',
+)
+_CURRENT_STATE_QUERY = f"""
+    SELECT {', '.join(CURRENT_STATE_SELECT_COLUMNS)}
+    FROM task_analytics.file_current_state
+    WHERE file_id = %(file_id)s
+    ORDER BY last_updated DESC
+    LIMIT 1
+"""
+
+# event_data serialization: naive datetimes are treated as UTC (they come from utcnow())
+EVENT_DATA_JSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+# Max files remembered in-process (lifecycle rows for upserts, current state for reads)
+LIFECYCLE_ROW_CACHE_SIZE = 50_000
+CURRENT_STATE_CACHE_SIZE = 50_000
+
+
+# Server-side query result cache for hot dashboard reads (ClickHouse 23.5+)
+PIPELINE_QUERY_CACHE_SETTINGS = {
+    'use_query_cache': 1,
+    'query_cache_ttl': 60,
+}
+
+# Response keys for the lifecycle analytics result rows, in query column order
+STAGE_PERFORMANCE_KEYS = ('stage', 'avg_duration_minutes', 'completed_files')
+PIPELINE_DISTRIBUTION_KEYS = ('stage', 'file_count', 'avg_stage_time_minutes')
+
+# Workers for independent read queries (each borrows a pooled connection)
+_query_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="clickhouse-lifecycle-query")
+
+
+def _run_query(query: str):
+    with clickhouse_service.get_client() as client:
+        return client.execute(query)
+
+
+# Server error codes caused by the rows themselves (parse/type/range errors); only
+# these are worth splitting a batch over. Anything else (missing table, memory limit,
+# too many parts, ...) fails every row the same way.
+ROW_DATA_ERROR_CODES = frozenset({
+    6,    # CANNOT_PARSE_TEXT
+    26,   # CANNOT_PARSE_QUOTED_STRING
+    27,   # CANNOT_PARSE_INPUT_ASSERTION_FAILED
+    38,   # CANNOT_PARSE_DATE
+    41,   # CANNOT_PARSE_DATETIME
+    53,   # TYPE_MISMATCH
+    69,   # ARGUMENT_OUT_OF_BOUND
+    70,   # CANNOT_CONVERT_TYPE
+    72,   # CANNOT_PARSE_NUMBER
+    117,  # INCORRECT_DATA
+    321,  # VALUE_IS_OUT_OF_RANGE_OF_DATA_TYPE
+})
+
+
+def _is_row_data_error(error: Exception) -> bool:
+    """Whether an INSERT failure can be blamed on specific rows of the batch"""
+    if isinstance(error, (TypeMismatchError, TypeError, ValueError)):
+        # Client-side conversion (types_check) of a row value
+        return True
+    return isinstance(error, ServerException) and error.code in ROW_DATA_ERROR_CODES
+
+
+def _insert_block(sql: str, data: List, columnar: bool = False):
+    """Execute a plain (synchronous) INSERT, so data errors are raised to the caller.
+    
+    Rows are already batched client-side; server-side async_insert would acknowledge
+    before parsing them and lose a bad batch silently.
+    """
+    with clickhouse_service.get_client() as client:
+        client.execute(sql, data, columnar=columnar, types_check=True)
+
+
+# Event ids: millisecond timestamp + per-process random prefix + counter, so ids
+# sort by time and need no urandom syscall per event
+_event_id_prefix = os.urandom(6).hex()
+_event_id_counter = itertools.count()
+
+
+def _reseed_event_ids():
+    global _event_id_prefix, _event_id_counter
+    _event_id_prefix = os.urandom(6).hex()
+    _event_id_counter = itertools.count()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reseed_event_ids)
+
+
+def _new_event_id() -> str:
+    """Return a 32-char hex id, lexicographically ordered by creation time"""
+    return f"{int(time.time() * 1000):012x}{_event_id_prefix}{next(_event_id_counter) & 0xFFFFFFFF:08x}"
+
+
+class _LRUCache:
+    """Small thread-safe LRU mapping with a fixed maximum size"""
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+    
+    def put(self, key: str, value: Dict):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class LifecycleBatcher:
+    """Coalesces lifecycle rows per table and inserts them in batches from a background thread"""
+    
+    def __init__(self, flush_interval_s: float = LIFECYCLE_FLUSH_INTERVAL_SECONDS,
+                 max_batch_rows: int = LIFECYCLE_MAX_BATCH_ROWS,
+                 merge_keys: Optional[Dict[str, str]] = None):
+        self.flush_interval_s = flush_interval_s
+        self.max_batch_rows = max_batch_rows
+        self.merge_keys = LIFECYCLE_MERGE_KEYS if merge_keys is None else merge_keys
+        # Queued rows are tuples, so merge keys are resolved to column positions once
+        self._merge_key_index = {
+            table: LIFECYCLE_INSERT_COLUMNS[table].index(column)
+            for table, column in self.merge_keys.items()
+        }
+        self.queues: Dict[str, List[tuple]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Tables are independent, so their INSERTs run in parallel
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(LIFECYCLE_SORT_KEYS), thread_name_prefix="clickhouse-lifecycle-insert"
+        )
+    
+    def enqueue(self, table: str, record: Dict):
+        """Queue a row for the given table; flushes early once a queue is full"""
+        row = LIFECYCLE_ROW_GETTERS[table](record)
+        with self._lock:
+            queue = self.queues[table]
+            queue.append(row)
+            full = len(queue) >= self.max_batch_rows
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="clickhouse-lifecycle-batcher", daemon=True
+                )
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+    
+    def _run(self):
+        """Background loop: flush every interval, or sooner when a queue fills up"""
+        while True:
+            self._wakeup.wait(self.flush_interval_s)
+            self._wakeup.clear()
+            self.flush()
+    
+    def flush(self):
+        """Drain all queues, one multi-row INSERT per table"""
+        with self._flush_lock:
+            with self._lock:
+                drained = self.queues
+                self.queues = defaultdict(list)
+            
+            batches = []
+            for table, rows in drained.items():
+                if not rows:
+                    continue
+                merge_index = self._merge_key_index.get(table)
+                if merge_index is not None:
+                    # Pre-merge like ReplacingMergeTree would: last queued row per key wins
+                    rows = list({row[merge_index]: row for row in rows}.values())
+                sort_key = LIFECYCLE_SORT_KEYS.get(table)
+                if sort_key:
+                    # Stable sort keeps queue order between versions of the same key
+                    rows.sort(key=sort_key)
+                batches.append((table, rows))
+            
+            if len(batches) == 1:
+                self._insert(*batches[0])
+                return
+            
+            try:
+                futures = [self._executor.submit(self._insert, table, rows) for table, rows in batches]
+            except RuntimeError:
+                # Executor already shut down (interpreter exit): insert sequentially
+                for table, rows in batches:
+                    self._insert(table, rows)
+                return
+            for future in futures:
+                future.result()
+    
+    def _insert(self, table: str, rows: List[tuple]):
+        if clickhouse_service.client is None:
+            logger.warning(f"ClickHouse unavailable - dropping {len(rows)} rows for {table}")
+            return
+        
+        self._insert_rows(table, rows)
+    
+    def _insert_rows(self, table: str, rows: List[tuple]):
+        """Insert rows; on a data error, split the batch to isolate the bad rows"""
+        # Rows share the table's column order, so transposing them gives the
+        # native columnar block directly
+        try:
+            _insert_block(LIFECYCLE_INSERT_SQL[table], list(zip(*rows)), columnar=True)
+            return
+        except Exception as e:
+            if not _is_row_data_error(e):
+                # Network or server-wide failure: every half would fail the same way
+                logger.error(f"Failed to insert {len(rows)} rows into {table}: {e}")
+                return
+            if len(rows) == 1:
+                logger.error(f"Dropping bad row for {table}: {rows[0]!r} ({e})")
+                return
+        
+        middle = len(rows) // 2
+        self._insert_rows(table, rows[:middle])
+        self._insert_rows(table, rows[middle:])
+
+
 class ClickHouseLifecycleService:
     """Enhanced ClickHouse service for complete file lifecycle tracking"""
     
+    def __init__(self):
+        self._batcher = LifecycleBatcher()
+        atexit.register(self._batcher.flush)
+        # This process is the writer of these tables, so its own writes are the
+        # freshest view: latest file_lifecycle row and current state per file
+        self._lifecycle_rows = _LRUCache(LIFECYCLE_ROW_CACHE_SIZE)
+        self._state_cache = _LRUCache(CURRENT_STATE_CACHE_SIZE)
+    
     def emit_file_lifecycle_event(self, file_id: str, event_type: str, 
                                  stage: str, employee_code: str = None,
                                  employee_name: str = None, 
-                                 event_data: Dict = None):
-        """Emit a file lifecycle event to ClickHouse"""
+                                 event_data: Union[Dict, str, bytes] = None):
+        """Emit a file lifecycle event to ClickHouse
+        
+        event_data may be a dict, or an already-serialized JSON str/bytes which
+        is stored as-is.
+        """
         
         if not CLICKHOUSE_ENABLED:
             logger.info(f"ClickHouse disabled - skipping lifecycle event for {file_id}")
             return
         
         try:
+            # One timestamp per event keeps event_time and state updates consistent;
+            # millisecond precision matches the DateTime64(3) columns
+            now = datetime.utcnow()
+            now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+            
             # Get previous state for context
             previous_state = self._get_current_state(file_id)
             
+            if isinstance(event_data, str):
+                event_data_json = event_data
+            elif isinstance(event_data, bytes):
+                event_data_json = event_data.decode()
+            else:
+                event_data_json = orjson.dumps(event_data or {}, option=EVENT_DATA_JSON_OPTIONS).decode()
+            
             event = {
-                'event_id': str(uuid.uuid4()),
+                'event_id': _new_event_id(),
                 'file_id': file_id,
                 'event_type': event_type,
                 'stage': stage,
                 'employee_code': employee_code or '',
                 'employee_name': employee_name or '',
-                'event_time': datetime.utcnow(),
-                'event_data': json.dumps(event_data or {}),
+                'event_time': now,
+                'event_data': event_data_json,
                 'previous_stage': previous_state.get('current_stage') if previous_state else None,
                 'next_stage': stage if event_type in ['STAGE_STARTED', 'STAGE_TRANSITION'] else None,
-                'duration_minutes': self._calculate_duration(file_id, event_type, previous_state) or 0,
-                'created_at': datetime.utcnow()
+                'duration_minutes': self._calculate_duration(file_id, event_type, previous_state, now=now) or 0
             }
             
-            # Insert into events table
-            clickhouse_service.client.execute(
-                'INSERT INTO task_analytics.file_lifecycle_events (*) VALUES',
-                [event]
-            )
+            # Queue for batched insert into events table
+            self._batcher.enqueue('file_lifecycle_events', event)
             
             # Update current state table
-            self._update_current_state(file_id, event_type, event, previous_state)
+            self._update_current_state(file_id, event_type, event, previous_state, now=now)
             
             # Also update file_lifecycle table for dashboard
             if event_type == 'FILE_CREATED':
@@ -68,10 +390,6 @@ class ClickHouseLifecycleService:
             return
         
         try:
-            # Parse event_data for file name
-            event_data = json.loads(event.get('event_data', '{}'))
-            file_name = event_data.get('file_name', file_id)
-            
             # Insert/update file_lifecycle record
             lifecycle_record = {
                 'file_id': file_id,
@@ -82,10 +400,8 @@ class ClickHouseLifecycleService:
                 'last_updated': event['event_time']
             }
             
-            clickhouse_service.client.execute(
-                'INSERT INTO task_analytics.file_lifecycle (*) VALUES',
-                [lifecycle_record]
-            )
+            self._batcher.enqueue('file_lifecycle', lifecycle_record)
+            self._lifecycle_rows.put(file_id, lifecycle_record)
             
             logger.info(f"Updated file_lifecycle for {file_id}")
             
@@ -98,22 +414,44 @@ class ClickHouseLifecycleService:
             return
         
         try:
-            # Update the stage in file_lifecycle
-            clickhouse_service.client.execute(
-                """
-                ALTER TABLE task_analytics.file_lifecycle 
-                UPDATE current_stage = %(stage)s,
-                       current_status = %(status)s,
-                       last_updated = %(updated)s
-                WHERE file_id = %(file_id)s
-                """,
-                {
-                    'file_id': file_id,
-                    'stage': event['stage'],
-                    'status': f"IN_{event['stage']}",
-                    'updated': event['event_time']
+            # file_lifecycle is a ReplacingMergeTree(last_updated): append a newer
+            # version of the row instead of mutating the existing one
+            known_row = self._lifecycle_rows.get(file_id)
+            
+            if known_row is not None:
+                lifecycle_record = {
+                    **known_row,
+                    'current_stage': event['stage'],
+                    'current_status': f"IN_{event['stage']}",
+                    'last_updated': event['event_time']
                 }
-            )
+                self._batcher.enqueue('file_lifecycle', lifecycle_record)
+                self._lifecycle_rows.put(file_id, lifecycle_record)
+            else:
+                # Row not written by this process: copy the unchanged columns server-side
+                with clickhouse_service.get_client() as client:
+                    client.execute(
+                        """
+                        INSERT INTO task_analytics.file_lifecycle
+                            (file_id, current_stage, current_status, uploaded_at, sla_deadline, last_updated)
+                        SELECT
+                            file_id,
+                            %(stage)s,
+                            %(status)s,
+                            argMax(uploaded_at, last_updated),
+                            argMax(sla_deadline, last_updated),
+                            %(updated)s
+                        FROM task_analytics.file_lifecycle
+                        WHERE file_id = %(file_id)s
+                        GROUP BY file_id
+                        """,
+                        {
+                            'file_id': file_id,
+                            'stage': event['stage'],
+                            'status': f"IN_{event['stage']}",
+                            'updated': event['event_time']
+                        }
+                    )
             
             logger.info(f"Updated file_lifecycle stage for {file_id} to {event['stage']}")
             
@@ -125,21 +463,30 @@ class ClickHouseLifecycleService:
         if not CLICKHOUSE_ENABLED:
             return None
         
+        cached_state = self._state_cache.get(file_id)
+        if cached_state is not None:
+            return cached_state
+        
         try:
-            query = "SELECT * FROM task_analytics.file_current_state WHERE file_id = %(file_id)s LIMIT 1"
-            result = clickhouse_service.client.execute(query, {'file_id': file_id})
-            return result[0] if result else None
+            with clickhouse_service.get_client() as client:
+                result = client.execute(_CURRENT_STATE_QUERY, {'file_id': file_id})
+            if not result:
+                return None
+            state = dict(zip(CURRENT_STATE_SELECT_COLUMNS, result[0]))
+            self._state_cache.put(file_id, state)
+            return state
         except Exception as e:
             logger.warning(f"Failed to get current state for {file_id}: {e}")
             return None
 
-    def _update_current_state(self, file_id: str, event_type: str, event: Dict, previous_state: Dict):
+    def _update_current_state(self, file_id: str, event_type: str, event: Dict, previous_state: Dict,
+                              now: Optional[datetime] = None):
         """Update the current state table"""
         if not CLICKHOUSE_ENABLED:
             return
         
         try:
-            now = datetime.utcnow()
+            now = now or datetime.utcnow()
             
             if event_type in ['STAGE_STARTED', 'STAGE_ASSIGNED']:
                 # New stage starting
@@ -178,20 +525,31 @@ class ClickHouseLifecycleService:
                     'last_updated': now
                 }
             
-            clickhouse_service.client.execute(
-                'INSERT INTO task_analytics.file_current_state (*) VALUES',
-                [state_update]
-            )
+            # Record when the stage started so completion duration needs no extra query
+            cached_state = {**(previous_state or {}), **state_update}
+            if event_type in ['STAGE_STARTED', 'STAGE_ASSIGNED']:
+                cached_state['stage_started_at'] = now
+            
+            # Write the full row (stage_started_at included): ReplacingMergeTree keeps
+            # only the newest version, and one column set per batch allows a columnar insert
+            state_row = {'file_id': file_id, 'last_updated': now}
+            for column, default in FILE_CURRENT_STATE_DEFAULTS.items():
+                value = cached_state.get(column)
+                state_row[column] = default if value is None else value
+            self._batcher.enqueue('file_current_state', state_row)
+            
+            self._state_cache.put(file_id, cached_state)
             
         except Exception as e:
             logger.warning(f"Failed to update current state for {file_id}: {e}")
 
-    def _calculate_duration(self, file_id: str, event_type: str, previous_state: Dict) -> int:
+    def _calculate_duration(self, file_id: str, event_type: str, previous_state: Dict,
+                            now: Optional[datetime] = None) -> int:
         """Calculate duration for lifecycle events"""
         if event_type == 'STAGE_COMPLETED' and previous_state:
             started_at = previous_state.get('stage_started_at')
             if started_at:
-                duration = int((datetime.utcnow() - started_at).total_seconds() / 60)
+                duration = int(((now or datetime.utcnow()) - started_at).total_seconds() / 60)
                 return max(0, duration)
         return 0
 
@@ -215,7 +573,8 @@ class ClickHouseLifecycleService:
             ORDER BY event_time ASC
             """
             
-            return clickhouse_service.client.execute(query, {'file_id': file_id})
+            with clickhouse_service.get_client() as client:
+                return client.execute(query, {'file_id': file_id})
         except Exception as e:
             logger.error(f"Failed to get lifecycle timeline for {file_id}: {e}")
             return []
@@ -223,9 +582,8 @@ class ClickHouseLifecycleService:
     def get_pipeline_view_realtime(self, stage_filter: str = None):
         """Get current pipeline view from current state table"""
         try:
-            where_clause = f"AND current_stage = '{stage_filter}'" if stage_filter else ""
-            
-            query = f"""
+            # Bound parameter instead of an interpolated literal: the driver escapes it
+            query = """
             SELECT 
                 current_stage,
                 file_id,
@@ -237,11 +595,16 @@ class ClickHouseLifecycleService:
                 sla_status
             FROM task_analytics.file_current_state
             WHERE current_stage != ''
-            {where_clause}
+            """ + ("AND current_stage = %(stage)s\n" if stage_filter else "") + """
             ORDER BY stage_started_at DESC
             """
             
-            return clickhouse_service.client.execute(query)
+            with clickhouse_service.get_client() as client:
+                return client.execute(
+                    query,
+                    {'stage': stage_filter} if stage_filter else None,
+                    settings=PIPELINE_QUERY_CACHE_SETTINGS
+                )
         except Exception as e:
             logger.error(f"Failed to get pipeline view: {e}")
             return []
@@ -249,70 +612,64 @@ class ClickHouseLifecycleService:
     def get_lifecycle_analytics(self) -> Dict:
         """Get comprehensive lifecycle analytics"""
         try:
-            # Average time per stage
-            stage_duration_query = """
-            SELECT 
-                stage,
-                avg(duration_minutes) as avg_duration,
-                count() as event_count
-            FROM task_analytics.file_lifecycle_events 
-            WHERE event_type = 'STAGE_COMPLETED'
-            GROUP BY stage
-            """
-            
-            # Files delivered per day
-            daily_deliveries_query = """
-            SELECT 
-                toDate(event_time) as delivery_date,
-                count() as files_delivered
-            FROM task_analytics.file_lifecycle_events 
-            WHERE event_type = 'FILE_DELIVERED'
-            GROUP BY delivery_date
-            ORDER BY delivery_date DESC
-            LIMIT 30
-            """
-            
-            # Current pipeline distribution
-            pipeline_distribution_query = """
-            SELECT 
-                current_stage,
-                count() as file_count,
-                avg(stage_duration_minutes) as avg_stage_time
-            FROM task_analytics.file_current_state
-            GROUP BY current_stage
-            """
-            
-            stage_durations = clickhouse_service.client.execute(stage_duration_query)
-            daily_deliveries = clickhouse_service.client.execute(daily_deliveries_query)
-            pipeline_dist = clickhouse_service.client.execute(pipeline_distribution_query)
-            
-            return {
-                'stage_performance': [
-                    {
-                        'stage': row[0],
-                        'avg_duration_minutes': row[1],
-                        'completed_files': row[2]
-                    } for row in stage_durations
-                ],
-                'daily_deliveries': [
-                    {
-                        'date': str(row[0]),
-                        'files_delivered': row[1]
-                    } for row in daily_deliveries
-                ],
-                'pipeline_distribution': [
-                    {
-                        'stage': row[0],
-                        'file_count': row[1],
-                        'avg_stage_time_minutes': row[2]
-                    } for row in pipeline_dist
-                ]
-            }
-            
+            return self._query_lifecycle_analytics()
         except Exception as e:
             logger.error(f"Failed to get lifecycle analytics: {e}")
             return {}
 
+    @cached(ttl_seconds=15, key_prefix="lifecycle_analytics")
+    def _query_lifecycle_analytics(self) -> Dict:
+        """Run the lifecycle analytics queries; raises on failure, so errors are never cached"""
+        # Average time per stage
+        stage_duration_query = """
+        SELECT 
+            stage,
+            avg(duration_minutes) as avg_duration,
+            count() as event_count
+        FROM task_analytics.file_lifecycle_events 
+        WHERE event_type = 'STAGE_COMPLETED'
+        GROUP BY stage
+        """
+        
+        # Files delivered per day
+        daily_deliveries_query = """
+        SELECT 
+            toDate(event_time) as delivery_date,
+            count() as files_delivered
+        FROM task_analytics.file_lifecycle_events 
+        WHERE event_type = 'FILE_DELIVERED'
+        GROUP BY delivery_date
+        ORDER BY delivery_date DESC
+        LIMIT 30
+        """
+        
+        # Current pipeline distribution
+        pipeline_distribution_query = """
+        SELECT 
+            current_stage,
+            count() as file_count,
+            avg(stage_duration_minutes) as avg_stage_time
+        FROM task_analytics.file_current_state
+        GROUP BY current_stage
+        """
+        
+        # The three aggregations are independent: run them concurrently
+        futures = [
+            _query_executor.submit(_run_query, query)
+            for query in (stage_duration_query, daily_deliveries_query, pipeline_distribution_query)
+        ]
+        stage_durations, daily_deliveries, pipeline_dist = (future.result() for future in futures)
+        
+        # Rows map positionally onto fixed key tuples, built in C via dict(zip())
+        return {
+            'stage_performance': [dict(zip(STAGE_PERFORMANCE_KEYS, row)) for row in stage_durations],
+            'daily_deliveries': [
+                {'date': str(delivery_date), 'files_delivered': files_delivered}
+                for delivery_date, files_delivered in daily_deliveries
+            ],
+            'pipeline_distribution': [dict(zip(PIPELINE_DISTRIBUTION_KEYS, row)) for row in pipeline_dist]
+        }
+
     def emit_sla_breach_event(self, file_id: str, stage: str, employee_code: str, 
                              employee_name: str, breach_data: Dict[str, Any]):
         """Emit SLA breach lifecycle event"""
@@ -3,14 +3,20 @@ ClickHouse Analytics Service
 High-performance analytics database for time-series data
 """
 import asyncio
+import atexit
+import functools
 import logging
+import operator
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, cast
+from typing import List, Dict, Any, Iterator, Optional, cast
 from clickhouse_driver import Client
 from app.db.mongodb import get_db
-import pandas as pd
 import re
 from app.core.settings import settings
+from app.services.cache_service import cached_by
 
 # Import SLA constants
 from app.constants.sla import STAGE_SLA_THRESHOLDS
@@ -22,19 +28,286 @@ CLICKHOUSE_ENABLED = True
 
 _MAIN_EVENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
 
+# Native connection pool bounds
+CLICKHOUSE_POOL_MIN_CONNECTIONS = 2
+CLICKHOUSE_POOL_MAX_CONNECTIONS = 16
+
+# Native protocol block compression (needs the clickhouse-driver[lz4] extra)
+CLICKHOUSE_COMPRESSION = 'lz4'
+
+# "Name (CODE)" reporting_manager values
+_MANAGER_CODE_RE = re.compile(r"\(([^)]+)\)")
+
+# task_events -> employee_stage_daily aggregation (materialized view body, and the
+# backfill with extra_conditions). min_completion_time is NULL when nothing completed
+# so it cannot mask real minimums when partial aggregates are merged.
+EMPLOYEE_STAGE_DAILY_SELECT_TEMPLATE = """
+    SELECT
+        employee_code,
+        toDate(assigned_at) AS date,
+        stage,
+        any(employee_name) AS employee_name,
+        max(assigned_at) AS last_assigned_at,
+        toUInt64(count()) AS tasks_assigned,
+        toUInt64(countIf(status = 'COMPLETED')) AS tasks_completed,
+        toUInt64(sumIf(duration_minutes, status = 'COMPLETED' AND duration_minutes > 0)) AS completed_duration_sum,
+        toUInt64(countIf(status = 'COMPLETED' AND duration_minutes > 0)) AS completed_duration_cnt,
+        maxIf(duration_minutes, status = 'COMPLETED' AND duration_minutes > 0) AS max_completion_time,
+        minIfOrNull(duration_minutes, status = 'COMPLETED' AND duration_minutes > 0) AS min_completion_time,
+        toUInt64(countIf(status = 'COMPLETED' AND duration_minutes > 60)) AS sla_breaches
+    FROM task_events
+    WHERE employee_code != ''
+      AND event_type = 'task_assigned'
+      {extra_conditions}
+    GROUP BY employee_code, date, stage
+"""
+
+# task_events -> task_events_latest rows backing get_pipeline_view
+TASK_EVENTS_LATEST_SELECT_TEMPLATE = """
+    SELECT
+        file_id, assigned_at, stage, status, employee_code, employee_name,
+        completed_at, duration_minutes, team_lead_id, priority
+    FROM task_events
+    WHERE file_id != ''
+      AND event_type IN ('stage_started', 'stage_completed', 'task_assigned')
+      AND stage IS NOT NULL
+      {extra_conditions}
+"""
+
+# task_events -> task_stage_daily aggregation backing get_task_analytics
+TASK_STAGE_DAILY_SELECT_TEMPLATE = """
+    SELECT
+        toDate(assigned_at) AS date,
+        stage,
+        toUInt64(count()) AS tasks_count,
+        toUInt64(countIf(status = 'COMPLETED')) AS completed_count,
+        toUInt64(sum(duration_minutes)) AS duration_sum,
+        max(duration_minutes) AS duration_max,
+        toUInt64(countIf(duration_minutes > 60)) AS breach_count,
+        quantilesTDigestState(0.5, 0.95, 0.99)(duration_minutes) AS duration_quantiles
+    FROM task_events
+    WHERE 1 = 1 {extra_conditions}
+    GROUP BY date, stage
+"""
+
+# Server-side async insert for single-row event writes: ClickHouse buffers and
+# merges them across connections instead of creating a part per INSERT
+ASYNC_INSERT_SETTINGS = {
+    'async_insert': 1,
+    'wait_for_async_insert': 0,
+    'async_insert_busy_timeout_ms': 1000,
+    'async_insert_max_data_size': 10_000_000,
+}
+
+# MongoDB -> ClickHouse task sync: rows per INSERT block, so memory stays bounded
+SYNC_INSERT_BLOCK_ROWS = 65_536
+
+# task_events columns written by the sync and the emit_* events, in INSERT order.
+# Avoid inserting into any materialized `date` column; ClickHouse will compute it.
+TASK_EVENTS_INSERT_COLUMNS = (
+    'task_id', 'employee_code', 'employee_name', 'stage', 'status', 'assigned_at',
+    'completed_at', 'duration_minutes', 'file_id', 'tracking_mode', 'team_lead_id', 'skills_required',
+    'priority', 'event_type', 'task_name',
+)
+TASK_EVENTS_INSERT_SQL = f"INSERT INTO task_events ({', '.join(TASK_EVENTS_INSERT_COLUMNS)}) VALUES"
+_task_event_row = operator.itemgetter(*TASK_EVENTS_INSERT_COLUMNS)
+
+# emit_* events are queued and written by a background flusher in multi-row INSERTs
+EVENT_QUEUE_MAX_SIZE = 50_000
+EVENT_FLUSH_MAX_ROWS = 10_000
+EVENT_FLUSH_INTERVAL_SECONDS = 0.5
+# Queued by stop_event_flusher: the flusher inserts what it has collected, then exits
+_EVENT_FLUSHER_STOP = object()
+
+# Fire-and-forget rows from sync callers (file_events, realtime_metrics) are buffered
+# per INSERT statement and written by a background thread
+INSERT_BUFFER_MAX_ROWS = 4096
+INSERT_BUFFER_FLUSH_INTERVAL_SECONDS = 1.0
+FILE_EVENTS_INSERT_SQL = "INSERT INTO file_events (file_id, event_type) VALUES"
+REALTIME_METRICS_INSERT_SQL = "INSERT INTO realtime_metrics (timestamp, metric_name, metric_value, tags) VALUES"
+
+
+def _to_date(expr: Any) -> Dict[str, Any]:
+    """Aggregation expression: BSON date, or ISO string parsed server-side; null when missing/invalid"""
+    return {'$convert': {'input': expr, 'to': 'date', 'onError': None, 'onNull': None}}
+
+
+def _first_non_empty(*exprs: Any) -> Any:
+    """Aggregation expression: first of exprs that is neither missing, null nor ''"""
+    result = exprs[-1]
+    for expr in reversed(exprs[:-1]):
+        result = {'$cond': [{'$ne': [{'$ifNull': [expr, '']}, '']}, expr, result]}
+    return result
+
+
+def _task_sync_pipeline(query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """MongoDB pipeline returning only the task fields synced to task_events"""
+    return [
+        {'$match': query},
+        {'$sort': {'assigned_at': 1}},
+        {'$addFields': {
+            '_start_time': _to_date({'$ifNull': ['$work_started_at', '$assigned_at']}),
+            '_completed_at': _to_date('$completed_at'),
+            '_created_at': _to_date('$created_at'),
+            # Fallback for manual tasks: use task_id as file_id so they appear in analytics
+            '_file_id': _first_non_empty(
+                '$file_id', '$source.permit_file_id', '$permit_file_id', '$task_id', {'$toString': '$_id'}
+            ),
+        }},
+        {'$project': {
+            'task_id': 1,
+            'assigned_to': 1,
+            'assigned_to_name': 1,
+            'stage': 1,
+            'status': 1,
+            'tracking_mode': 1,
+            'skills_required': 1,
+            'priority': 1,
+            'title': 1,
+            '_start_time': 1,
+            '_completed_at': 1,
+            '_file_id': 1,
+            '_assigned_at': {'$ifNull': ['$_start_time', '$_created_at']},
+            '_duration_ms': {'$cond': [
+                {'$and': [{'$ne': ['$_completed_at', None]}, {'$ne': ['$_start_time', None]}]},
+                {'$subtract': ['$_completed_at', '$_start_time']},
+                None,
+            ]},
+        }},
+    ]
+
+
+@cached_by(ttl_seconds=60, arg_names=("task_id",), key_prefix="clickhouse_task_event_fields")
+def _get_task_event_fields(task_id: str) -> Dict[str, Any]:
+    """Task fields copied into task_events rows; {} when the task does not exist"""
+    task = get_db().tasks.find_one(
+        {"task_id": task_id},
+        {"_id": 0, "title": 1, "tracking_mode": 1},
+    )
+    return task or {}
+
+
+class ClickHouseClientPool:
+    """Thread-safe pool of native ClickHouse clients
+    
+    A clickhouse-driver Client runs one query at a time, so concurrent callers
+    (executor threads, the lifecycle batcher) each borrow their own connection.
+    `execute` mirrors Client.execute so the pool can stand in for a single client.
+    """
+    
+    def __init__(self, connections_min: int = CLICKHOUSE_POOL_MIN_CONNECTIONS,
+                 connections_max: int = CLICKHOUSE_POOL_MAX_CONNECTIONS, **client_kwargs):
+        self._client_kwargs = client_kwargs
+        self._idle: "queue.LifoQueue[Client]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(connections_max)
+        for _ in range(connections_min):
+            self._idle.put(Client(**client_kwargs))
+    
+    @contextmanager
+    def get_client(self) -> Iterator[Client]:
+        """Borrow a client for the duration of the with-block"""
+        self._slots.acquire()
+        try:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                client = Client(**self._client_kwargs)
+            try:
+                yield client
+            except Exception:
+                # Drop a connection that may be mid-query; it reconnects on next use
+                client.disconnect()
+                raise
+            finally:
+                self._idle.put(client)
+        finally:
+            self._slots.release()
+    
+    def execute(self, *args, **kwargs):
+        """Run Client.execute on a pooled connection"""
+        with self.get_client() as client:
+            return client.execute(*args, **kwargs)
+
+
+class ClickHouseInsertBuffer:
+    """Coalesces single-row INSERTs into multi-row INSERTs from a background thread
+    
+    Rows are queued per INSERT statement and flushed every flush interval, or as
+    soon as one statement has max_batch_rows rows queued.
+    """
+    
+    def __init__(self, service: "ClickHouseService",
+                 flush_interval_s: float = INSERT_BUFFER_FLUSH_INTERVAL_SECONDS,
+                 max_batch_rows: int = INSERT_BUFFER_MAX_ROWS):
+        self._service = service
+        self.flush_interval_s = flush_interval_s
+        self.max_batch_rows = max_batch_rows
+        self.queues: Dict[str, List[tuple]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def append(self, insert_sql: str, row: tuple) -> None:
+        """Queue one row for insert_sql; never blocks on ClickHouse"""
+        with self._lock:
+            rows = self.queues.setdefault(insert_sql, [])
+            rows.append(row)
+            full = len(rows) >= self.max_batch_rows
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="clickhouse-insert-buffer", daemon=True
+                )
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+    
+    def _run(self) -> None:
+        """Background loop: flush every interval, or sooner when a queue fills up"""
+        while True:
+            self._wakeup.wait(self.flush_interval_s)
+            self._wakeup.clear()
+            self.flush()
+    
+    def flush(self) -> None:
+        """Drain all queues, one multi-row INSERT per statement"""
+        with self._flush_lock:
+            with self._lock:
+                drained = self.queues
+                self.queues = {}
+            
+            client = self._service.client
+            for insert_sql, rows in drained.items():
+                if client is None:
+                    logger.warning(f"ClickHouse unavailable - dropping {len(rows)} buffered rows")
+                    continue
+                try:
+                    # Rows share the statement's column order: send them as columns
+                    client.execute(insert_sql, list(zip(*rows)), columnar=True)
+                except Exception as e:
+                    logger.error(f"Failed to insert {len(rows)} buffered rows ({insert_sql}): {e}")
+
+
 class ClickHouseService:
     """Service for ClickHouse analytics operations"""
     
     def __init__(self):
-        # Initialize ClickHouse client only if enabled
-        self.client: Optional[Client] = None
+        # Initialize ClickHouse connection pool only if enabled
+        self.client: Optional[ClickHouseClientPool] = None
+        # Created on the main event loop by set_main_event_loop
+        self._event_queue: Optional[asyncio.Queue] = None
+        self._event_flusher_task: Optional[asyncio.Task] = None
+        # Sync-path single-row inserts; whatever is still queued is written at exit
+        self._insert_buffer = ClickHouseInsertBuffer(self)
+        atexit.register(self._insert_buffer.flush)
 
         if CLICKHOUSE_ENABLED:
             try:
-                self.client = Client(
+                self.client = ClickHouseClientPool(
                     host=settings.clickhouse_host,
                     port=settings.clickhouse_port,
                     database=settings.clickhouse_database,
+                    compression=CLICKHOUSE_COMPRESSION,
                     # Add authentication if needed
                     # user='default',
                     # password='',
@@ -50,6 +323,14 @@ class ClickHouseService:
         else:
             logger.info("ClickHouse disabled via configuration.")
     
+    @contextmanager
+    def get_client(self) -> Iterator[Client]:
+        """Borrow a pooled ClickHouse client for several statements"""
+        if self.client is None:
+            raise RuntimeError("ClickHouse client is not connected")
+        with self.client.get_client() as client:
+            yield client
+    
     def _ensure_tables(self):
         """Create analytics tables if they don't exist"""
         client = self.client
@@ -64,25 +345,36 @@ class ClickHouseService:
                     task_id String,
                     employee_code String,
                     employee_name String,
-                    stage String,
-                    stage_original String,
-                    status String,
+                    stage LowCardinality(String),
+                    stage_original LowCardinality(String),
+                    status LowCardinality(String),
                     task_name String,
                     assigned_at DateTime64(3),
                     completed_at Nullable(DateTime64(3)),
                     duration_minutes UInt32,
                     file_id String,
-                    tracking_mode String DEFAULT 'FILE_BASED',
+                    tracking_mode LowCardinality(String) DEFAULT 'FILE_BASED',
                     date Date MATERIALIZED (toDate(assigned_at)),
                     team_lead_id String,
                     skills_required Array(String),
                     priority UInt8,
-                    event_type String,
+                    event_type LowCardinality(String),
                     created_at DateTime64(3) DEFAULT now64()
                 ) ENGINE = MergeTree()
                 PARTITION BY toYYYYMM(date)
                 ORDER BY (date, task_id, stage, event_type)
             """)
+            # The pipeline view now reads task_events_latest; the per-file projection
+            # it used is no longer worth its insert cost
+            client.execute("ALTER TABLE task_events DROP PROJECTION IF EXISTS proj_pipeline")
+            # event_type is not in the sort key but most queries filter on a few of
+            # its values; a set index lets granules without them be skipped. New parts
+            # get it on insert; existing parts are backfilled by
+            # scripts/materialize_clickhouse_task_events.py
+            client.execute("""
+                ALTER TABLE task_events
+                ADD INDEX IF NOT EXISTS idx_event_type event_type TYPE set(8) GRANULARITY 4
+            """)
             
             # Employee performance table
             client.execute("""
@@ -103,6 +395,78 @@ class ClickHouseService:
                 ORDER BY (employee_code, date)
             """)
             
+            # Per employee/day/stage rollup of task_assigned events, kept current at
+            # insert time by employee_stage_daily_mv; employee_performance is
+            # refreshed from it instead of rescanning task_events
+            client.execute("""
+                CREATE TABLE IF NOT EXISTS employee_stage_daily (
+                    employee_code String,
+                    date Date,
+                    stage LowCardinality(String),
+                    employee_name SimpleAggregateFunction(any, String),
+                    last_assigned_at SimpleAggregateFunction(max, DateTime64(3)),
+                    tasks_assigned SimpleAggregateFunction(sum, UInt64),
+                    tasks_completed SimpleAggregateFunction(sum, UInt64),
+                    completed_duration_sum SimpleAggregateFunction(sum, UInt64),
+                    completed_duration_cnt SimpleAggregateFunction(sum, UInt64),
+                    max_completion_time SimpleAggregateFunction(max, UInt32),
+                    min_completion_time SimpleAggregateFunction(min, Nullable(UInt32)),
+                    sla_breaches SimpleAggregateFunction(sum, UInt64)
+                ) ENGINE = AggregatingMergeTree()
+                PARTITION BY toYYYYMM(date)
+                ORDER BY (employee_code, date, stage)
+            """)
+            # Rows inserted before the view existed are backfilled by
+            # scripts/materialize_clickhouse_task_events.py
+            client.execute(f"""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS employee_stage_daily_mv
+                TO employee_stage_daily
+                AS {EMPLOYEE_STAGE_DAILY_SELECT_TEMPLATE.format(extra_conditions='')}
+            """)
+            
+            # Latest pipeline event per file, replacing older versions by assigned_at
+            client.execute("""
+                CREATE TABLE IF NOT EXISTS task_events_latest (
+                    file_id String,
+                    assigned_at DateTime64(3),
+                    stage LowCardinality(String),
+                    status LowCardinality(String),
+                    employee_code String,
+                    employee_name String,
+                    completed_at Nullable(DateTime64(3)),
+                    duration_minutes UInt32,
+                    team_lead_id String,
+                    priority UInt8
+                ) ENGINE = ReplacingMergeTree(assigned_at)
+                ORDER BY file_id
+            """)
+            client.execute(f"""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS task_events_latest_mv
+                TO task_events_latest
+                AS {TASK_EVENTS_LATEST_SELECT_TEMPLATE.format(extra_conditions='')}
+            """)
+            
+            # Per day/stage task duration rollup for the task analytics dashboard
+            client.execute("""
+                CREATE TABLE IF NOT EXISTS task_stage_daily (
+                    date Date,
+                    stage LowCardinality(String),
+                    tasks_count SimpleAggregateFunction(sum, UInt64),
+                    completed_count SimpleAggregateFunction(sum, UInt64),
+                    duration_sum SimpleAggregateFunction(sum, UInt64),
+                    duration_max SimpleAggregateFunction(max, UInt32),
+                    breach_count SimpleAggregateFunction(sum, UInt64),
+                    duration_quantiles AggregateFunction(quantilesTDigest(0.5, 0.95, 0.99), UInt32)
+                ) ENGINE = AggregatingMergeTree()
+                PARTITION BY toYYYYMM(date)
+                ORDER BY (date, stage)
+            """)
+            client.execute(f"""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS task_stage_daily_mv
+                TO task_stage_daily
+                AS {TASK_STAGE_DAILY_SELECT_TEMPLATE.format(extra_conditions='')}
+            """)
+            
             # SLA analytics table
             client.execute("""
                 CREATE TABLE IF NOT EXISTS sla_metrics (
@@ -134,33 +498,44 @@ class ClickHouseService:
                 CREATE TABLE IF NOT EXISTS file_lifecycle_events (
                     event_id String,
                     file_id String,
-                    event_type String,
-                    stage String,
+                    event_type LowCardinality(String),
+                    stage LowCardinality(String),
                     employee_code String,
                     employee_name String,
                     event_time DateTime64(3),
                     event_data String,
-                    previous_stage Nullable(String),
-                    next_stage Nullable(String),
+                    previous_stage LowCardinality(Nullable(String)),
+                    next_stage LowCardinality(Nullable(String)),
                     duration_minutes UInt32,
-                    created_at DateTime64(3) DEFAULT now64()
+                    created_at DateTime64(3) DEFAULT event_time
                 ) ENGINE = MergeTree()
                 ORDER BY (file_id, event_time, event_type)
             """)
+            # created_at is no longer sent by writers; derive it from event_time
+            client.execute("""
+                ALTER TABLE file_lifecycle_events
+                MODIFY COLUMN created_at DateTime64(3) DEFAULT event_time
+            """)
             
             # File current state table
             client.execute("""
                 CREATE TABLE IF NOT EXISTS file_current_state (
                     file_id String,
-                    current_stage String,
-                    current_status String,
+                    current_stage LowCardinality(String),
+                    current_status LowCardinality(String),
                     current_employee_code String,
                     current_employee_name String,
                     last_updated DateTime64(3),
-                    total_duration_minutes UInt32
+                    total_duration_minutes UInt32,
+                    stage_started_at Nullable(DateTime64(3))
                 ) ENGINE = ReplacingMergeTree(last_updated)
                 ORDER BY file_id
             """)
+            # Tables created before stage_started_at was tracked
+            client.execute("""
+                ALTER TABLE file_current_state
+                ADD COLUMN IF NOT EXISTS stage_started_at Nullable(DateTime64(3))
+            """)
             
             # File events table
             client.execute("""
@@ -176,8 +551,8 @@ class ClickHouseService:
             client.execute("""
                 CREATE TABLE IF NOT EXISTS file_lifecycle (
                     file_id String,
-                    current_stage String,
-                    current_status String,
+                    current_stage LowCardinality(String),
+                    current_status LowCardinality(String),
                     uploaded_at DateTime64(3),
                     sla_deadline Nullable(DateTime64(3)),
                     last_updated DateTime64(3) DEFAULT now64()
@@ -218,9 +593,106 @@ class ClickHouseService:
     def set_main_event_loop(self, loop: asyncio.AbstractEventLoop) -> None:
         global _MAIN_EVENT_LOOP
         _MAIN_EVENT_LOOP = loop
+        
+        if self._event_flusher_task is None:
+            self._event_queue = asyncio.Queue(maxsize=EVENT_QUEUE_MAX_SIZE)
+            self._event_flusher_task = loop.create_task(self._event_flusher())
+    
+    def _insert_task_events(self, rows: List[tuple], async_insert: bool = False) -> None:
+        """Insert task_events rows (tuples in TASK_EVENTS_INSERT_COLUMNS order) as one columnar block.
+        
+        Flusher batches are already client-side batched and go in as plain INSERTs, so
+        data errors surface here; async_insert is for unbatched single-row writes.
+        """
+        if self.client is None:
+            return
+        settings = ASYNC_INSERT_SETTINGS if async_insert else None
+        self.client.execute(TASK_EVENTS_INSERT_SQL, list(zip(*rows)), columnar=True, settings=settings)
+    
+    async def _enqueue_task_event(self, event_data: Dict[str, Any]) -> None:
+        """Queue a task_events row for the background flusher"""
+        row = _task_event_row(event_data)
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if self._event_queue is None or running_loop is not _MAIN_EVENT_LOOP:
+            # No flusher on this loop (scripts, worker threads): insert directly
+            await self._run_in_executor(self._insert_task_events, [row], async_insert=True)
+            return
+        await self._event_queue.put(row)
+    
+    async def _event_flusher(self) -> None:
+        """Drain queued events into one INSERT per EVENT_FLUSH_MAX_ROWS rows or flush interval"""
+        loop = asyncio.get_running_loop()
+        event_queue = cast(asyncio.Queue, self._event_queue)
+        stopping = False
+        while not stopping:
+            row = await event_queue.get()
+            if row is _EVENT_FLUSHER_STOP:
+                return
+            rows = [row]
+            deadline = loop.time() + EVENT_FLUSH_INTERVAL_SECONDS
+            while len(rows) < EVENT_FLUSH_MAX_ROWS:
+                if not event_queue.empty():
+                    row = event_queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(event_queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if row is _EVENT_FLUSHER_STOP:
+                    # Insert the rows already taken off the queue before exiting
+                    stopping = True
+                    break
+                rows.append(row)
+            
+            try:
+                await loop.run_in_executor(None, self._insert_task_events, rows)
+            except Exception as e:
+                logger.error(f"Failed to insert {len(rows)} task events: {e}")
+    
+    async def stop_event_flusher(self) -> None:
+        """Stop the background flusher and insert any events still queued"""
+        if self._event_flusher_task is None:
+            return
+        # A sentinel rather than cancel(): rows the flusher is still collecting are
+        # off the queue, and cancelling mid-collection would drop them
+        if not self._event_flusher_task.done():
+            await cast(asyncio.Queue, self._event_queue).put(_EVENT_FLUSHER_STOP)
+        try:
+            await self._event_flusher_task
+        except Exception as e:
+            logger.error(f"Task event flusher failed during shutdown: {e}")
+        self._event_flusher_task = None
+        
+        rows = []
+        while self._event_queue is not None and not self._event_queue.empty():
+            rows.append(self._event_queue.get_nowait())
+        self._event_queue = None
+        if rows:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._insert_task_events, rows)
+            except Exception as e:
+                logger.error(f"Failed to insert {len(rows)} task events on shutdown: {e}")
+    
+    async def _run_in_executor(self, func, *args, **kwargs):
+        """Run a blocking call (pymongo, clickhouse-driver) off the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+    
+    async def _execute(self, *args, **kwargs):
+        """Client.execute on a pooled connection, without blocking the event loop"""
+        return await self._run_in_executor(cast(ClickHouseClientPool, self.client).execute, *args, **kwargs)
     
     async def sync_tasks_from_mongodb(self, since: Optional[datetime] = None):
         """Sync task data from MongoDB to ClickHouse"""
+        await self._run_in_executor(self._sync_tasks_from_mongodb, since)
+    
+    def _sync_tasks_from_mongodb(self, since: Optional[datetime] = None):
+        """Blocking body of sync_tasks_from_mongodb"""
         if not CLICKHOUSE_ENABLED or self.client is None:
             logger.info("ClickHouse is disabled - skipping MongoDB sync")
             return
@@ -231,50 +703,50 @@ class ClickHouseService:
             employees = list(db.employee.find({}, {"_id": 0, "employee_code": 1, "employee_name": 1, "reporting_manager": 1, "employment": 1}))
             employee_lookup = {e.get("employee_code"): e for e in employees if e.get("employee_code")}
 
+            # Few distinct reporting_manager values repeat across many tasks; memoize
+            # per sync since the result depends on this sync's employee_lookup
+            manager_cache: Dict[str, tuple[str, str]] = {}
+
             def _extract_manager_code_and_name(raw: str) -> tuple[str, str]:
-                raw = (raw or "").strip()
-                if not raw:
-                    return "", ""
-                match = re.search(r"\(([^)]+)\)", raw)
-                if match:
-                    code = match.group(1).strip()
-                    name = raw.split("(", 1)[0].strip()
-                    return code, name
-                if raw in employee_lookup:
-                    return raw, employee_lookup[raw].get("employee_name", "")
-                return raw, ""
-            
-            # Find tasks assigned in the last sync period
+                cached = manager_cache.get(raw)
+                if cached is not None:
+                    return cached
+                value = (raw or "").strip()
+                if not value:
+                    result = ("", "")
+                else:
+                    match = _MANAGER_CODE_RE.search(value)
+                    if match:
+                        result = (match.group(1).strip(), value.split("(", 1)[0].strip())
+                    elif value in employee_lookup:
+                        result = (value, employee_lookup[value].get("employee_name", ""))
+                    else:
+                        result = (value, "")
+                manager_cache[raw] = result
+                return result
+            
+            # Find tasks assigned in the last sync period; timestamps, duration and
+            # file_id fallback are computed by MongoDB and only used fields are returned
             query = {"assigned_at": {"$gte": since}} if since else {}
-            assigned_tasks = list(db.tasks.find(query).sort("assigned_at", 1))
-            logger.info(f"Syncing {len(assigned_tasks)} assigned tasks from MongoDB to ClickHouse since {since or 'beginning'}")
+            assigned_tasks = db.tasks.aggregate(_task_sync_pipeline(query), batchSize=10000)
+            logger.info(f"Syncing assigned tasks from MongoDB to ClickHouse since {since or 'beginning'}")
             skipped_missing_file_id = 0
             skipped_missing_file_id_samples: List[str] = []
+            synced_rows = 0
             batch_rows = []
             for task in assigned_tasks:
-                # Calculate duration based on work_started_at if available, otherwise assigned_at
-                start_time = task.get('work_started_at') or task.get('assigned_at')
+                # Duration from work_started_at if available, otherwise assigned_at
                 duration = 0
-                if task.get('completed_at') and start_time:
-                    if isinstance(task["completed_at"], str):
-                        completed_at = datetime.fromisoformat(task["completed_at"].replace('Z', '+00:00'))
-                    else:
-                        completed_at = task["completed_at"]
-                    
-                    if isinstance(start_time, str):
-                        start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                    else:
-                        start_time = start_time
-                    
-                    # Calculate duration and ensure it's non-negative (UInt32 requirement)
-                    duration_seconds = (completed_at - start_time).total_seconds()
-                    duration = max(0, int(duration_seconds / 60))  # Clamp to 0 if negative
+                duration_ms = task.get('_duration_ms')
+                if duration_ms is not None:
+                    # Ensure it's non-negative (UInt32 requirement)
+                    duration = max(0, int(duration_ms // 60000))
                     
                     # Log warning if negative duration detected (data quality issue)
-                    if duration_seconds < 0:
+                    if duration_ms < 0:
                         logger.warning(
                             f"Negative duration detected for task {task.get('task_id')}: "
-                            f"completed_at={completed_at}, start_time={start_time}. "
+                            f"completed_at={task.get('_completed_at')}, start_time={task.get('_start_time')}. "
                             f"Setting duration to 0."
                         )
                 
@@ -287,29 +759,15 @@ class ClickHouseService:
                     manager_raw = emp_doc.get('reporting_manager') or emp_doc.get('employment', {}).get('reporting_manager') or ""
                 manager_code, _manager_name = _extract_manager_code_and_name(manager_raw)
 
-                # Use work_started_at or assigned_at for ClickHouse timestamp (prioritize work_started_at)
-                assigned_at_value = task.get('work_started_at') or task.get('assigned_at') or task.get('created_at')
-                completed_at_value = task.get('completed_at')
-                if isinstance(assigned_at_value, str):
-                    assigned_at_value = datetime.fromisoformat(assigned_at_value.replace('Z', '+00:00'))
-                if isinstance(completed_at_value, str):
-                    completed_at_value = datetime.fromisoformat(completed_at_value.replace('Z', '+00:00'))
+                # work_started_at, else assigned_at, else created_at (parsed by the pipeline)
+                assigned_at_value = task.get('_assigned_at')
+                completed_at_value = task.get('_completed_at')
 
                 # Skip rows without any timestamp
                 if not assigned_at_value:
                     continue
 
-                # Extract file_id with better fallback logic
-                file_id = None
-                if task.get('file_id'):
-                    file_id = task.get('file_id')
-                elif task.get('source', {}).get('permit_file_id'):
-                    file_id = task.get('source', {}).get('permit_file_id')
-                elif task.get('permit_file_id'):
-                    file_id = task.get('permit_file_id')
-                else:
-                    # Fallback for manual tasks: use task_id as file_id so they appear in analytics
-                    file_id = task.get('task_id') or str(task.get('_id'))
+                file_id = task.get('_file_id')
                 
                 # Extract tracking_mode from task
                 tracking_mode = task.get('tracking_mode', 'FILE_BASED' if file_id and file_id.strip() and file_id != 'None' else 'STANDALONE')
@@ -338,15 +796,18 @@ class ClickHouseService:
                     'task_assigned',  # Event type for pipeline view inclusion
                     (task.get('title') or '')  # task_name at end
                 ))
+                
+                # Stream to ClickHouse block by block while the cursor is still being read
+                if len(batch_rows) >= SYNC_INSERT_BLOCK_ROWS:
+                    self._insert_task_event_block(batch_rows)
+                    synced_rows += len(batch_rows)
+                    batch_rows = []
             
-            # Batch insert into ClickHouse
-            # Avoid inserting into any materialized `date` column; ClickHouse will compute it.
-            self.client.execute(
-                'INSERT INTO task_events (task_id, employee_code, employee_name, stage, status, assigned_at, completed_at, duration_minutes, file_id, tracking_mode, team_lead_id, skills_required, priority, event_type, task_name) VALUES',
-                batch_rows
-            )
+            if batch_rows:
+                self._insert_task_event_block(batch_rows)
+                synced_rows += len(batch_rows)
             
-            logger.info(f"Synced {len(batch_rows)} tasks to ClickHouse (including task_assigned events)")
+            logger.info(f"Synced {synced_rows} tasks to ClickHouse (including task_assigned events)")
             if skipped_missing_file_id:
                 logger.warning(
                     "Skipped %s tasks during ClickHouse sync due to missing file_id (sample task_ids=%s)",
@@ -357,8 +818,16 @@ class ClickHouseService:
         except Exception as e:
             logger.error(f"Failed to sync tasks to ClickHouse: {e}")
     
+    def _insert_task_event_block(self, rows: List[tuple]) -> None:
+        """Insert sync rows as one native columnar block (one sequence per column)"""
+        self.client.execute(TASK_EVENTS_INSERT_SQL, list(zip(*rows)), columnar=True)
+    
     async def sync_employee_performance(self, days: int = 30):
         """Calculate and sync employee performance metrics"""
+        await self._run_in_executor(self._sync_employee_performance, days)
+    
+    def _sync_employee_performance(self, days: int = 30):
+        """Blocking body of sync_employee_performance"""
         if not CLICKHOUSE_ENABLED or self.client is None:
             logger.info("ClickHouse is disabled - skipping employee performance sync")
             return
@@ -368,14 +837,9 @@ class ClickHouseService:
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=days)
 
-            try:
-                self.client.execute(
-                    f"ALTER TABLE employee_performance DELETE WHERE date >= '{start_date}' AND date < '{end_date}'"
-                )
-            except Exception as e:
-                logger.warning(f"Failed to clear employee_performance for refresh window: {e}")
-
-            self.client.execute(f"""
+            # employee_performance is a ReplacingMergeTree on (employee_code, date):
+            # recomputed rows supersede the previous ones, no DELETE mutation needed
+            self.client.execute("""
                 INSERT INTO employee_performance
                 WITH per_stage AS (
                     SELECT
@@ -383,18 +847,16 @@ class ClickHouseService:
                         any(employee_name) AS employee_name,
                         date,
                         stage,
-                        max(assigned_at) as assigned_at,
-                        count() AS tasks_assigned_stage,
-                        countIf(status = 'COMPLETED') AS tasks_completed_stage,
-                        sumIf(duration_minutes, status = 'COMPLETED' AND duration_minutes > 0) AS completed_duration_sum,
-                        countIf(status = 'COMPLETED' AND duration_minutes > 0) AS completed_duration_cnt,
-                        maxIf(duration_minutes, status = 'COMPLETED' AND duration_minutes > 0) AS max_completion_time_stage,
-                        minIf(duration_minutes, status = 'COMPLETED' AND duration_minutes > 0) AS min_completion_time_stage,
-                        countIf(status = 'COMPLETED' AND duration_minutes > 60) AS sla_breaches_stage
-                    FROM task_events
-                    WHERE date >= '{start_date}' AND date < '{end_date}'
-                      AND employee_code != ''
-                      AND event_type = 'task_assigned'
+                        max(last_assigned_at) as assigned_at,
+                        sum(tasks_assigned) AS tasks_assigned_stage,
+                        sum(tasks_completed) AS tasks_completed_stage,
+                        sum(completed_duration_sum) AS completed_duration_sum,
+                        sum(completed_duration_cnt) AS completed_duration_cnt,
+                        max(max_completion_time) AS max_completion_time_stage,
+                        ifNull(min(min_completion_time), 0) AS min_completion_time_stage,
+                        sum(sla_breaches) AS sla_breaches_stage
+                    FROM employee_stage_daily
+                    WHERE date >= %(start_date)s AND date < %(end_date)s
                     GROUP BY employee_code, date, stage
                 )
                 SELECT
@@ -415,7 +877,7 @@ class ClickHouseService:
                     ) AS stage_performance
                 FROM per_stage
                 GROUP BY employee_code, date
-            """)
+            """, {'start_date': start_date, 'end_date': end_date})
             
             logger.info(f"Synced employee performance for {days} days")
             
@@ -428,27 +890,26 @@ class ClickHouseService:
             return []
         
         try:
-            where_clause = ""
-            if stage:
-                where_clause += f" AND stage = '{stage}'"
-            
-            return self.client.execute(f"""
+            # Reads the task_stage_daily rollup (whole days) rather than raw events;
+            # the identical quantile merges are computed once by ClickHouse
+            return self.client.execute("""
                 SELECT 
                     stage,
-                    count() as total_tasks,
-                    countIf(status = 'COMPLETED') as completed_tasks,
-                    avg(duration_minutes) as avg_duration,
-                    median(duration_minutes) as median_duration,
-                    quantile(0.95)(duration_minutes) as p95_duration,
-                    quantile(0.99)(duration_minutes) as p99_duration,
-                    max(duration_minutes) as max_duration,
-                    countIf(duration_minutes > 60) as total_breaches,
-                    round(total_breaches / count() * 100, 2) as breach_rate
-                FROM task_events
-                WHERE assigned_at >= now() - INTERVAL {days} DAY {where_clause}
+                    sum(tasks_count) as total_tasks,
+                    sum(completed_count) as completed_tasks,
+                    sum(duration_sum) / total_tasks as avg_duration,
+                    quantilesTDigestMerge(0.5, 0.95, 0.99)(duration_quantiles)[1] as median_duration,
+                    quantilesTDigestMerge(0.5, 0.95, 0.99)(duration_quantiles)[2] as p95_duration,
+                    quantilesTDigestMerge(0.5, 0.95, 0.99)(duration_quantiles)[3] as p99_duration,
+                    max(duration_max) as max_duration,
+                    sum(breach_count) as total_breaches,
+                    round(total_breaches / total_tasks * 100, 2) as breach_rate
+                FROM task_stage_daily
+                WHERE date >= today() - %(days)s
+                  AND (%(stage)s = '' OR stage = %(stage)s)
                 GROUP BY stage
                 ORDER BY stage
-            """)
+            """, {'days': days, 'stage': stage or ''})
             
         except Exception as e:
             logger.error(f"Failed to get task analytics: {e}")
@@ -460,11 +921,7 @@ class ClickHouseService:
             return []
         
         try:
-            stage_filter = ""
-            if stage:
-                stage_filter = f" AND stage_latest = '{stage}'"
-            
-            return self.client.execute(f"""
+            return self.client.execute("""
                 SELECT
                     CASE
                         WHEN status_latest = 'COMPLETED' THEN 'COMPLETED'
@@ -492,27 +949,24 @@ class ClickHouseService:
                         ELSE 'escalation_needed'
                     END as sla_status
                 FROM (
+                    -- One row per file: its latest pipeline event, if within the window
                     SELECT
                         file_id,
-                        argMax(stage, assigned_at) as stage_latest,
-                        argMax(employee_code, assigned_at) as employee_code_latest,
-                        argMax(employee_name, assigned_at) as employee_name_latest,
-                        argMax(status, assigned_at) as status_latest,
-                        max(assigned_at) as assigned_at_latest,
-                        argMax(completed_at, assigned_at) as completed_at_latest,
-                        argMax(duration_minutes, assigned_at) as duration_minutes_latest,
-                        argMax(team_lead_id, assigned_at) as team_lead_id_latest,
-                        argMax(priority, assigned_at) as priority_latest
-                    FROM task_events
+                        stage as stage_latest,
+                        employee_code as employee_code_latest,
+                        employee_name as employee_name_latest,
+                        status as status_latest,
+                        assigned_at as assigned_at_latest,
+                        completed_at as completed_at_latest,
+                        duration_minutes as duration_minutes_latest,
+                        team_lead_id as team_lead_id_latest,
+                        priority as priority_latest
+                    FROM task_events_latest FINAL
                     WHERE assigned_at >= now() - INTERVAL 7 DAY
-                      AND file_id != ''
-                      AND event_type IN ('stage_started', 'stage_completed', 'task_assigned')
-                      AND stage IS NOT NULL
-                    GROUP BY file_id
                 )
-                WHERE 1 = 1 {stage_filter}
+                WHERE (%(stage)s = '' OR stage_latest = %(stage)s)
                 ORDER BY stage_latest, assigned_at_latest DESC
-            """)
+            """, {'stage': stage or ''})
             
         except Exception as e:
             logger.error(f"Failed to get pipeline view from ClickHouse: {e}")
@@ -524,9 +978,13 @@ class ClickHouseService:
             return {"managers": [], "employees": [], "days": days, "limit_employees": limit_employees}
         
         try:
-            managers = self.client.execute(f"""
+            # Both rollups in one round-trip; rows are tagged with their rollup kind
+            rows = self.client.execute("""
                 SELECT
+                    'manager' as kind,
                     team_lead_id as reporting_manager_code,
+                    '' as employee_code,
+                    '' as employee_name,
                     count() as total_tasks,
                     countIf(status = 'COMPLETED') as completed_tasks,
                     countIf(status = 'IN_PROGRESS') as in_progress_tasks,
@@ -536,28 +994,43 @@ class ClickHouseService:
                     quantile(0.95)(duration_minutes) as p95_duration_minutes,
                     countIf(duration_minutes > 60) as breaches_count
                 FROM task_events
-                WHERE assigned_at >= now() - INTERVAL {days} DAY
+                WHERE assigned_at >= now() - INTERVAL %(days)s DAY
                   AND team_lead_id != ''
                 GROUP BY team_lead_id
-                ORDER BY total_tasks DESC
-            """)
-
-            employees = self.client.execute(f"""
+                
+                UNION ALL
+                
                 SELECT
+                    'employee' as kind,
                     team_lead_id as reporting_manager_code,
                     employee_code,
                     any(employee_name) as employee_name,
-                    count() as task_count,
+                    count() as total_tasks,
                     countIf(status = 'COMPLETED') as completed_tasks,
                     countIf(status = 'IN_PROGRESS') as in_progress_tasks,
-                    avgIf(duration_minutes, duration_minutes > 0) as avg_duration_minutes
+                    0 as assigned_tasks,
+                    0 as completion_rate,
+                    avgIf(duration_minutes, duration_minutes > 0) as avg_duration_minutes,
+                    0 as p95_duration_minutes,
+                    0 as breaches_count
                 FROM task_events
-                WHERE assigned_at >= now() - INTERVAL {days} DAY
+                WHERE assigned_at >= now() - INTERVAL %(days)s DAY
                   AND team_lead_id != ''
                   AND employee_code != ''
                 GROUP BY team_lead_id, employee_code
-                ORDER BY reporting_manager_code, task_count DESC
-            """)
+            """, {'days': days})
+
+            # Same row shapes and order as the former separate queries
+            managers = [
+                (row[1], row[4], row[5], row[6], row[7], row[8], row[9], row[10], row[11])
+                for row in rows if row[0] == 'manager'
+            ]
+            managers.sort(key=lambda row: row[1], reverse=True)
+            employees = [
+                (row[1], row[2], row[3], row[4], row[5], row[6], row[9])
+                for row in rows if row[0] == 'employee'
+            ]
+            employees.sort(key=lambda row: (row[0], -row[3]))
 
             return {
                 "managers": managers,
@@ -575,7 +1048,7 @@ class ClickHouseService:
             return []
         
         try:
-            return self.client.execute(f"""
+            return self.client.execute("""
                 SELECT 
                     employee_code,
                     employee_name,
@@ -586,12 +1059,12 @@ class ClickHouseService:
                     sum(sla_breaches) as total_breaches,
                     avg(efficiency_score) as efficiency,
                     groupArray(stage_performance) as stage_performance
-                FROM employee_performance
-                WHERE date >= today() - {days}
+                FROM employee_performance FINAL
+                WHERE date >= today() - %(days)s
                 GROUP BY employee_code, employee_name
                 ORDER BY total_completed DESC
-                LIMIT {limit}
-            """)
+                LIMIT %(limit)s
+            """, {'days': days, 'limit': limit})
             
         except Exception as e:
             logger.error(f"Failed to get employee performance: {e}")
@@ -603,7 +1076,7 @@ class ClickHouseService:
             return []
         
         try:
-            return self.client.execute(f"""
+            return self.client.execute("""
                 SELECT 
                     date,
                     stage,
@@ -614,9 +1087,9 @@ class ClickHouseService:
                     p95_duration,
                     p99_duration
                 FROM sla_metrics
-                WHERE date >= today() - {days}
+                WHERE date >= today() - %(days)s
                 ORDER BY date DESC, stage
-            """)
+            """, {'days': days})
             
         except Exception as e:
             logger.error(f"Failed to get SLA analytics: {e}")
@@ -628,16 +1101,16 @@ class ClickHouseService:
             return []
         
         try:
-            return self.client.execute(f"""
+            return self.client.execute("""
                 SELECT 
                     metric_name,
                     argMax(metric_value, timestamp) as latest_value,
                     timestamp
                 FROM realtime_metrics
-                WHERE timestamp >= now() - INTERVAL {hours} HOUR
+                WHERE timestamp >= now() - INTERVAL %(hours)s HOUR
                 GROUP BY metric_name
                 ORDER BY metric_name
-            """)
+            """, {'hours': hours})
             
         except Exception as e:
             logger.error(f"Failed to get real-time metrics: {e}")
@@ -649,14 +1122,9 @@ class ClickHouseService:
             return
         
         try:
-            self.client.execute(
-                'INSERT INTO realtime_metrics VALUES',
-                [{
-                    'timestamp': datetime.now(),
-                    'metric_name': metric_name,
-                    'metric_value': value,
-                    'tags': tags or {}
-                }]
+            self._insert_buffer.append(
+                REALTIME_METRICS_INSERT_SQL,
+                (datetime.now(), metric_name, value, tags or {})
             )
         except Exception as e:
             logger.error(f"Failed to update real-time metric {metric_name}: {e}")
@@ -681,33 +1149,33 @@ class ClickHouseService:
                 'team_lead_id': uploaded_by,
                 'skills_required': [],
                 'priority': 0,
-                'event_type': 'file_created'
+                'event_type': 'file_created',
+                'tracking_mode': 'FILE_BASED',
+                'task_name': ''
             }
             
-            self.client.execute(
-                'INSERT INTO task_events (task_id, employee_code, employee_name, stage, status, assigned_at, completed_at, duration_minutes, file_id, team_lead_id, skills_required, priority, event_type) VALUES',
-                [event_data]
-            )
+            await self._enqueue_task_event(event_data)
             
             logger.info(f"Emitted file_created event for {file_id}")
             
         except Exception as e:
             logger.error(f"Failed to emit file_created event: {e}")
     
-    async def emit_task_assigned_event(self, task_id: str, employee_code: str, employee_name: str, assigned_by: str, file_id_param: Optional[str] = None, tracking_mode: Optional[str] = None):
+    async def emit_task_assigned_event(self, task_id: str, employee_code: str, employee_name: str, assigned_by: str, file_id_param: Optional[str] = None, tracking_mode: Optional[str] = None, task_name: Optional[str] = None):
         """Emit task assignment event to ClickHouse"""
         if not CLICKHOUSE_ENABLED:
             logger.info(f"ClickHouse disabled - skipping task assignment event for {task_id}")
             return
         
         try:
-            from app.db.mongodb import get_db
-            db = get_db()
-            task = db.tasks.find_one({"task_id": task_id})
-            true_stage = task.get("stage", "UNASSIGNED") if task else "UNASSIGNED"
+            # Callers holding the task document pass task_name (and its tracking_mode);
+            # otherwise look the fields up, cached per task_id
+            task = await self._run_in_executor(_get_task_event_fields, task_id) if task_name is None else {}
+            if task_name is None:
+                task_name = task.get('title', '')
             
             # Determine tracking_mode
-            effective_tracking_mode = tracking_mode or (task.get('tracking_mode') if task else None) or ('FILE_BASED' if file_id_param else 'STANDALONE')
+            effective_tracking_mode = tracking_mode or task.get('tracking_mode') or ('FILE_BASED' if file_id_param else 'STANDALONE')
             
             event_data = {
                 'task_id': task_id,
@@ -724,32 +1192,30 @@ class ClickHouseService:
                 'skills_required': [],
                 'priority': 0,
                 'event_type': 'task_assigned',
-                'task_name': task.get('title', '') if task else ''
+                'task_name': task_name or ''
             }
             
-            self.client.execute(
-                'INSERT INTO task_events (task_id, employee_code, employee_name, stage, status, assigned_at, completed_at, duration_minutes, file_id, tracking_mode, team_lead_id, skills_required, priority, event_type, task_name) VALUES',
-                [event_data]
-            )
+            await self._enqueue_task_event(event_data)
             
             logger.info(f"Emitted task_assigned event for {task_id} to {employee_code} (tracking_mode={effective_tracking_mode})")
             
         except Exception as e:
             logger.error(f"Failed to emit task_assigned event: {e}")
     
-    async def emit_stage_started_event(self, task_id: str, employee_code: str, employee_name: str, stage: str, file_id_param: Optional[str] = None, tracking_mode: Optional[str] = None):
+    async def emit_stage_started_event(self, task_id: str, employee_code: str, employee_name: str, stage: str, file_id_param: Optional[str] = None, tracking_mode: Optional[str] = None, task_name: Optional[str] = None):
         """Emit stage started event to ClickHouse"""
         if not CLICKHOUSE_ENABLED or self.client is None:
             return
         
         try:
-            from app.db.mongodb import get_db
-            db = get_db()
-            task = db.tasks.find_one({"task_id": task_id})
-            task_name = task.get('title', '') if task else ''
+            # Callers holding the task document pass task_name (and its tracking_mode);
+            # otherwise look the fields up, cached per task_id
+            task = await self._run_in_executor(_get_task_event_fields, task_id) if task_name is None else {}
+            if task_name is None:
+                task_name = task.get('title', '')
             
             # Determine tracking_mode
-            effective_tracking_mode = tracking_mode or (task.get('tracking_mode') if task else None) or ('FILE_BASED' if file_id_param else 'STANDALONE')
+            effective_tracking_mode = tracking_mode or task.get('tracking_mode') or ('FILE_BASED' if file_id_param else 'STANDALONE')
             
             event_data = {
                 'task_id': task_id,
@@ -766,32 +1232,30 @@ class ClickHouseService:
                 'skills_required': [],
                 'priority': 0,
                 'event_type': 'stage_started',
-                'task_name': task_name
+                'task_name': task_name or ''
             }
             
-            self.client.execute(
-                'INSERT INTO task_events (task_id, employee_code, employee_name, stage, status, assigned_at, completed_at, duration_minutes, file_id, tracking_mode, team_lead_id, skills_required, priority, event_type, task_name) VALUES',
-                [event_data]
-            )
+            await self._enqueue_task_event(event_data)
             
             logger.info(f"Emitted stage_started event for {task_id} in {stage} (tracking_mode={effective_tracking_mode})")
             
         except Exception as e:
             logger.error(f"Failed to emit stage_started event: {e}")
     
-    async def emit_stage_completed_event(self, task_id: str, employee_code: str, employee_name: str, stage: str, duration_minutes: int, file_id_param: Optional[str] = None, tracking_mode: Optional[str] = None):
+    async def emit_stage_completed_event(self, task_id: str, employee_code: str, employee_name: str, stage: str, duration_minutes: int, file_id_param: Optional[str] = None, tracking_mode: Optional[str] = None, task_name: Optional[str] = None):
         """Emit stage completed event to ClickHouse"""
         if not CLICKHOUSE_ENABLED or self.client is None:
             return
         
         try:
-            from app.db.mongodb import get_db
-            db = get_db()
-            task = db.tasks.find_one({"task_id": task_id})
-            task_name = task.get('title', '') if task else ''
+            # Callers holding the task document pass task_name (and its tracking_mode);
+            # otherwise look the fields up, cached per task_id
+            task = await self._run_in_executor(_get_task_event_fields, task_id) if task_name is None else {}
+            if task_name is None:
+                task_name = task.get('title', '')
             
             # Determine tracking_mode
-            effective_tracking_mode = tracking_mode or (task.get('tracking_mode') if task else None) or ('FILE_BASED' if file_id_param else 'STANDALONE')
+            effective_tracking_mode = tracking_mode or task.get('tracking_mode') or ('FILE_BASED' if file_id_param else 'STANDALONE')
             
             event_data = {
                 'task_id': task_id,
@@ -808,13 +1272,10 @@ class ClickHouseService:
                 'skills_required': [],
                 'priority': 0,
                 'event_type': 'stage_completed',
-                'task_name': task_name
+                'task_name': task_name or ''
             }
             
-            self.client.execute(
-                'INSERT INTO task_events (task_id, employee_code, employee_name, stage, status, assigned_at, completed_at, duration_minutes, file_id, tracking_mode, team_lead_id, skills_required, priority, event_type, task_name) VALUES',
-                [event_data]
-            )
+            await self._enqueue_task_event(event_data)
             
             logger.info(f"Emitted stage_completed event for {task_id} in {stage} (tracking_mode={effective_tracking_mode})")
             
@@ -840,13 +1301,12 @@ class ClickHouseService:
                 'team_lead_id': '',
                 'skills_required': [],
                 'priority': 1,  # High priority for SLA breaches
-                'event_type': 'sla_breach'
+                'event_type': 'sla_breach',
+                'tracking_mode': 'FILE_BASED',
+                'task_name': ''
             }
             
-            self.client.execute(
-                'INSERT INTO task_events (task_id, employee_code, employee_name, stage, status, assigned_at, completed_at, duration_minutes, file_id, team_lead_id, skills_required, priority, event_type) VALUES',
-                [event_data]
-            )
+            await self._enqueue_task_event(event_data)
             
             logger.info(f"Emitted sla_breach event for {file_id} in {stage}")
             
@@ -861,11 +1321,9 @@ class ClickHouseService:
             return
         
         try:
-            # Insert SLA breach event into file_events (idempotent)
-            self.client.execute(
-                'INSERT INTO file_events (file_id, event_type) VALUES',
-                [(file_id or file_id_param, 'SLA_BREACH')]
-            )
+            # Buffered into file_events; event_time is set when the batch lands,
+            # at most INSERT_BUFFER_FLUSH_INTERVAL_SECONDS later
+            self._insert_buffer.append(FILE_EVENTS_INSERT_SQL, (file_id or file_id_param, 'SLA_BREACH'))
             logger.info(f"Recorded SLA breach event for {file_id or file_id_param}")
         except Exception as e:
             logger.error(f"Failed to record SLA breach event: {e}")
@@ -876,12 +1334,24 @@ class ClickHouseService:
             return
         
         try:
-            # ClickHouse requires OPTIMIZE TABLE after ALTER TABLE UPDATE
+            # file_lifecycle is a ReplacingMergeTree(last_updated): append a newer version
+            # of the row (unchanged columns copied server-side, last_updated defaults to
+            # now) instead of mutating the table; readers use FINAL
             self.client.execute(
-                f"ALTER TABLE file_lifecycle UPDATE current_stage = '{new_stage}', current_status = 'IN_{new_stage}' WHERE file_id = '{file_id}'"
+                """
+                INSERT INTO file_lifecycle (file_id, current_stage, current_status, uploaded_at, sla_deadline)
+                SELECT
+                    file_id,
+                    %(stage)s,
+                    %(status)s,
+                    argMax(uploaded_at, last_updated),
+                    argMax(sla_deadline, last_updated)
+                FROM file_lifecycle
+                WHERE file_id = %(file_id)s
+                GROUP BY file_id
+                """,
+                {'stage': new_stage, 'status': f"IN_{new_stage}", 'file_id': file_id}
             )
-            # Apply mutations immediately
-            self.client.execute("OPTIMIZE TABLE file_lifecycle FINAL")
             logger.info(f"Updated file_lifecycle stage for {file_id} to {new_stage}")
         except Exception as e:
             logger.error(f"Failed to update file_lifecycle stage: {e}")
@@ -892,9 +1362,7 @@ class ClickHouseService:
             return []
         
         try:
-            where_clause = f"AND fl.current_stage = '{stage_filter}'" if stage_filter else ""
-            
-            query = f"""
+            query = """
                 SELECT 
                     fl.current_stage,
                     fl.file_id,
@@ -913,7 +1381,7 @@ class ClickHouseService:
                         WHEN fl.current_stage IN ('COMPLETED', 'DELIVERED') AND dateDiff('minute', tfm.assigned_at, now64()) <= 5 THEN 'within_ideal'
                         ELSE 'escalation_needed'
                     END as sla_status
-                FROM file_lifecycle fl
+                FROM file_lifecycle fl FINAL
                 LEFT JOIN (
                     SELECT file_id, employee_id, employee_name, assigned_at
                     FROM task_file_map
@@ -922,11 +1390,11 @@ class ClickHouseService:
                     HAVING assigned_at = max(assigned_at)
                 ) tfm ON fl.file_id = tfm.file_id
                 WHERE fl.current_stage != ''
-                {where_clause}
+                  AND (%(stage)s = '' OR fl.current_stage = %(stage)s)
                 ORDER BY fl.uploaded_at DESC
             """
             
-            return self.client.execute(query)
+            return self.client.execute(query, {'stage': stage_filter or ''})
         except Exception as e:
             logger.error(f"Failed to get real-time pipeline view: {e}")
             return []
@@ -938,7 +1406,7 @@ class ClickHouseService:
         
         try:
             # Get team lead stats with employee breakdown from last 7 days only
-            query = f"""
+            query = """
                 SELECT
                     team_lead_id as team_lead_code,
                     employee_code,
@@ -950,7 +1418,7 @@ class ClickHouseService:
                     round(completed_tasks / nullIf(total_tasks, 0) * 100, 2) as completion_rate,
                     groupArray((task_id, task_name, status, toString(assigned_at), toString(completed_at))) as tasks
                 FROM task_events
-                WHERE assigned_at >= now() - INTERVAL {days} DAY
+                WHERE assigned_at >= now() - INTERVAL %(days)s DAY
                   AND team_lead_id != ''
                   AND employee_code != ''
                   AND event_type IN ('task_assigned', 'task_sync')
@@ -958,10 +1426,9 @@ class ClickHouseService:
                 ORDER BY team_lead_id, total_tasks DESC
             """
             
-            results = self.client.execute(query)
+            results = self.client.execute(query, {'days': days})
             
             # Fetch team lead names from MongoDB
-            from app.db.mongodb import get_db
             db = get_db()
             team_lead_names = {}
             unique_team_leads = set(row[0] for row in results)
@@ -1069,7 +1536,7 @@ class ClickHouseService:
             return []
         
         try:
-            query = f"""
+            query = """
                 SELECT
                     file_id,
                     argMax(stage, assigned_at) as current_stage,
@@ -1083,19 +1550,18 @@ class ClickHouseService:
                     max(assigned_at) as last_updated,
                     groupArray((task_id, task_name, status, employee_code, employee_name, toString(assigned_at), toString(completed_at))) as tasks
                 FROM task_events
-                WHERE assigned_at >= now() - INTERVAL {days} DAY
+                WHERE assigned_at >= now() - INTERVAL %(days)s DAY
                   AND file_id != ''
                   AND tracking_mode = 'FILE_BASED'
                   AND event_type IN ('task_assigned', 'task_sync')
                 GROUP BY file_id
                 ORDER BY last_updated DESC
-                LIMIT {limit}
+                LIMIT %(limit)s
             """
             
-            results = self.client.execute(query)
+            results = self.client.execute(query, {'days': days, 'limit': limit})
             
             # Fetch client names from MongoDB permit_files collection
-            from app.db.mongodb import get_db
             db = get_db()
             file_names = {}
             unique_file_ids = set(row[0] for row in results)
@@ -1164,7 +1630,7 @@ class ClickHouseService:
         
         try:
             # Get pipeline view grouped by stage
-            pipeline_query = f"""
+            pipeline_query = """
                 SELECT
                     argMax(stage, assigned_at) as current_stage,
                     file_id,
@@ -1174,7 +1640,7 @@ class ClickHouseService:
                     max(assigned_at) as last_assigned,
                     dateDiff('minute', max(assigned_at), now64()) as duration_minutes
                 FROM task_events
-                WHERE assigned_at >= now() - INTERVAL {days} DAY
+                WHERE assigned_at >= now() - INTERVAL %(days)s DAY
                   AND file_id != ''
                   AND tracking_mode = 'FILE_BASED'
                   AND event_type IN ('task_assigned', 'stage_started', 'task_sync')
@@ -1183,7 +1649,7 @@ class ClickHouseService:
                 ORDER BY last_assigned DESC
             """
             
-            pipeline_results = self.client.execute(pipeline_query)
+            pipeline_results = self.client.execute(pipeline_query, {'days': days})
             
             # Group by stage - include completed files
             pipeline = {
@@ -1195,7 +1661,7 @@ class ClickHouseService:
             }
             
             # Also get completed files separately
-            completed_query = f"""
+            completed_query = """
                 SELECT
                     argMax(stage, assigned_at) as current_stage,
                     file_id,
@@ -1205,7 +1671,7 @@ class ClickHouseService:
                     max(assigned_at) as last_assigned,
                     dateDiff('minute', max(assigned_at), now64()) as duration_minutes
                 FROM task_events
-                WHERE assigned_at >= now() - INTERVAL {days} DAY
+                WHERE assigned_at >= now() - INTERVAL %(days)s DAY
                   AND file_id != ''
                   AND tracking_mode = 'FILE_BASED'
                   AND event_type IN ('task_assigned', 'stage_started', 'task_sync')
@@ -1214,7 +1680,7 @@ class ClickHouseService:
                 ORDER BY last_assigned DESC
             """
             
-            completed_results = self.client.execute(completed_query)
+            completed_results = self.client.execute(completed_query, {'days': days})
             logger.info(f"Found {len(completed_results)} completed files for dashboard")
             
             for row in pipeline_results:
@@ -1278,7 +1744,7 @@ class ClickHouseService:
                     pipeline[stage].append(file_data)
             
             # Get SLA breaches
-            breach_query = f"""
+            breach_query = """
                 SELECT
                     file_id,
                     argMax(stage, assigned_at) as current_stage,
@@ -1286,7 +1752,7 @@ class ClickHouseService:
                     argMax(employee_name, assigned_at) as employee_name,
                     dateDiff('minute', max(assigned_at), now64()) as duration_minutes
                 FROM task_events
-                WHERE assigned_at >= now() - INTERVAL {days} DAY
+                WHERE assigned_at >= now() - INTERVAL %(days)s DAY
                   AND file_id != ''
                   AND tracking_mode = 'FILE_BASED'
                 GROUP BY file_id
@@ -1295,7 +1761,7 @@ class ClickHouseService:
                 LIMIT 100
             """
             
-            breach_results = self.client.execute(breach_query)
+            breach_results = self.client.execute(breach_query, {'days': days})
             
             sla_breaches = []
             for row in breach_results:
@@ -1317,7 +1783,7 @@ class ClickHouseService:
                 })
             
             # Get recent activity (delivered today)
-            delivered_query = f"""
+            delivered_query = """
                 SELECT
                     file_id,
                     argMax(employee_code, assigned_at) as employee_code,
@@ -4,8 +4,11 @@ Ensures one physical file has only one file_id across the system
 """
 
 import hashlib
+import heapq
 import logging
-from typing import Optional, Dict, List
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Union, BinaryIO
 from datetime import datetime
 
 from app.db.mongodb import get_db
@@ -13,13 +16,62 @@ from app.models.stage_flow import FileStage
 
 logger = logging.getLogger(__name__)
 
+# Bytes read per update when hashing files and file-like objects
+HASH_CHUNK_SIZE = 1 << 20
+
+# Worker threads for bulk hashing; hashlib releases the GIL while hashing
+HASH_MAX_WORKERS = os.cpu_count() or 4
+
+# permit_files indexes backing the deduplication queries
+PERMIT_FILES_INDEXES = [
+    [("file_hash", 1), ("uploaded_at", 1)],  # Hash lookup; duplicate detection, oldest file first
+    [("file_info.original_filename", 1)],  # Exact filename lookup
+    [("file_size", 1), ("file_info.original_filename", 1)],  # Size + filename pattern fallback
+]
+
+def _stage_history_time(entry: dict) -> datetime:
+    """Merge key for stage_history entries: entered_stage_at, missing/legacy values first"""
+    entered_at = entry.get('entered_stage_at')
+    return entered_at if isinstance(entered_at, datetime) else datetime.min
+
+
 class FileDeduplicationService:
     """Service for managing file deduplication and consolidation"""
     
     @staticmethod
-    def generate_content_hash(file_content: bytes) -> str:
-        """Generate SHA-256 hash of file content"""
-        return hashlib.sha256(file_content).hexdigest()
+    def ensure_indexes() -> None:
+        """Ensure the permit_files indexes used by deduplication exist"""
+        db = get_db()
+        for index in PERMIT_FILES_INDEXES:
+            db.permit_files.create_index(index)
+    
+    @staticmethod
+    def generate_content_hash(file_content: Union[bytes, str, os.PathLike, BinaryIO]) -> str:
+        """
+        Generate SHA-256 hash of file content
+        Accepts the content itself, a file path, or a binary file-like object;
+        paths and file objects are streamed in HASH_CHUNK_SIZE chunks
+        """
+        if isinstance(file_content, (bytes, bytearray, memoryview)):
+            return hashlib.sha256(file_content).hexdigest()
+        
+        if isinstance(file_content, (str, os.PathLike)):
+            with open(file_content, 'rb') as file_obj:
+                return FileDeduplicationService.generate_content_hash(file_obj)
+        
+        file_hash = hashlib.sha256()
+        for chunk in iter(lambda: file_content.read(HASH_CHUNK_SIZE), b''):
+            file_hash.update(chunk)
+        return file_hash.hexdigest()
+    
+    @staticmethod
+    def generate_content_hashes(files: List[Union[bytes, str, os.PathLike, BinaryIO]]) -> List[str]:
+        """Generate SHA-256 hashes for many files in parallel, in input order"""
+        if len(files) <= 1:
+            return [FileDeduplicationService.generate_content_hash(f) for f in files]
+        
+        with ThreadPoolExecutor(max_workers=min(HASH_MAX_WORKERS, len(files))) as executor:
+            return list(executor.map(FileDeduplicationService.generate_content_hash, files))
     
     @staticmethod
     def find_existing_file(file_hash: str, file_size: int, file_name: str) -> Optional[str]:
@@ -192,45 +244,46 @@ class FileDeduplicationService:
             logger.info(f"Consolidating {len(duplicate_file_ids)} duplicates into {target_file_id}")
             
             # Consolidate file_tracking entries
-            target_tracking = db.file_tracking.find_one({'file_id': target_file_id})
+            target_tracking = db.file_tracking.find_one({'file_id': target_file_id}, {'stage_history': 1})
+            dup_trackings = db.file_tracking.find(
+                {'file_id': {'$in': duplicate_file_ids}}, {'stage_history': 1}
+            )
             
-            for dup_id in duplicate_file_ids:
-                # Move stage history from duplicate to target
-                dup_tracking = db.file_tracking.find_one({'file_id': dup_id})
-                if dup_tracking:
-                    # Merge stage history
-                    dup_history = dup_tracking.get('stage_history', [])
-                    if dup_history and target_tracking:
-                        existing_history = target_tracking.get('stage_history', [])
-                        # Combine and deduplicate
-                        combined_history = existing_history + dup_history
-                        # Sort by timestamp if available
-                        combined_history.sort(key=lambda x: x.get('started_at', datetime.min))
-                        
-                        db.file_tracking.update_one(
-                            {'file_id': target_file_id},
-                            {'$set': {'stage_history': combined_history}}
-                        )
-                
-                # Move tasks to target file
-                db.tasks.update_many(
-                    {'source.permit_file_id': dup_id},
-                    {'$set': {'source.permit_file_id': target_file_id}}
-                )
+            # Move stage history from all duplicates to target in one update
+            dup_histories = [
+                dup_tracking['stage_history']
+                for dup_tracking in dup_trackings
+                if dup_tracking.get('stage_history')
+            ]
+            if dup_histories and target_tracking:
+                existing_history = target_tracking.get('stage_history', [])
+                # Each history is appended in time order, so a k-way merge keeps the result ordered
+                combined_history = list(heapq.merge(existing_history, *dup_histories, key=_stage_history_time))
                 
-                # Move profile_building entries
-                db.profile_building.update_many(
-                    {'permit_file_id': dup_id},
-                    {'$set': {'permit_file_id': target_file_id}}
+                db.file_tracking.update_one(
+                    {'file_id': target_file_id},
+                    {'$set': {'stage_history': combined_history}}
                 )
-                
-                # Delete duplicate file_tracking
-                db.file_tracking.delete_one({'file_id': dup_id})
-                
-                # Delete duplicate permit_files entry
-                db.permit_files.delete_one({'file_id': dup_id})
-                
-                logger.info(f"Consolidated duplicate: {dup_id} -> {target_file_id}")
+            
+            # Move tasks to target file
+            db.tasks.update_many(
+                {'source.permit_file_id': {'$in': duplicate_file_ids}},
+                {'$set': {'source.permit_file_id': target_file_id}}
+            )
+            
+            # Move profile_building entries
+            db.profile_building.update_many(
+                {'permit_file_id': {'$in': duplicate_file_ids}},
+                {'$set': {'permit_file_id': target_file_id}}
+            )
+            
+            # Delete duplicate file_tracking
+            db.file_tracking.delete_many({'file_id': {'$in': duplicate_file_ids}})
+            
+            # Delete duplicate permit_files entries
+            db.permit_files.delete_many({'file_id': {'$in': duplicate_file_ids}})
+            
+            logger.info(f"Consolidated duplicates: {duplicate_file_ids} -> {target_file_id}")
             
             return True
             
@@ -246,36 +299,23 @@ class FileDeduplicationService:
         """
         db = get_db()
         
-        # Group files by hash
-        hash_groups = {}
-        all_files = list(db.permit_files.find({
-            'file_hash': {'$exists': True, '$ne': None}
-        }))
-        
-        for file_doc in all_files:
-            file_hash = file_doc.get('file_hash')
-            file_id = file_doc.get('file_id')
-            created_at = file_doc.get('uploaded_at', datetime.min)
-            
-            if file_hash not in hash_groups:
-                hash_groups[file_hash] = []
-            hash_groups[file_hash].append({
-                'file_id': file_id,
-                'created_at': created_at,
-                'file_doc': file_doc
-            })
+        # Group files by hash server-side, oldest first, keeping only hashes with duplicates
+        pipeline = [
+            {'$match': {'file_hash': {'$exists': True, '$ne': None}}},
+            {'$sort': {'file_hash': 1, 'uploaded_at': 1}},
+            {'$group': {'_id': '$file_hash', 'file_ids': {'$push': '$file_id'}, 'count': {'$sum': 1}}},
+            {'$match': {'count': {'$gt': 1}}},
+        ]
         
-        # Find duplicates and determine target (oldest)
+        # Determine target (oldest) for each group
         duplicate_groups = {}
-        for file_hash, files in hash_groups.items():
-            if len(files) > 1:
-                # Sort by creation date, oldest first
-                files.sort(key=lambda x: x['created_at'])
-                target_file_id = files[0]['file_id']
-                duplicate_ids = [f['file_id'] for f in files[1:]]
-                
-                duplicate_groups[target_file_id] = duplicate_ids
-                logger.info(f"Found duplicates for hash {file_hash[:16]}...: target={target_file_id}, duplicates={duplicate_ids}")
+        for group in db.permit_files.aggregate(pipeline, allowDiskUse=True):
+            file_hash = group['_id']
+            target_file_id = group['file_ids'][0]
+            duplicate_ids = group['file_ids'][1:]
+            
+            duplicate_groups[target_file_id] = duplicate_ids
+            logger.info(f"Found duplicates for hash {file_hash[:16]}...: target={target_file_id}, duplicates={duplicate_ids}")
         
         return duplicate_groups
     
@@ -302,30 +342,35 @@ class FileDeduplicationService:
         """Get statistics about file deduplication"""
         db = get_db()
         
+        # Whole-collection counts come from collection metadata
         stats = {
-            'permit_files_count': db.permit_files.count_documents({}),
-            'file_tracking_count': db.file_tracking.count_documents({}),
-            'tasks_count': db.tasks.count_documents({}),
-            'profile_building_count': db.profile_building.count_documents({}),
-            'files_with_hash': db.permit_files.count_documents({'file_hash': {'$exists': True}}),
+            'permit_files_count': db.permit_files.estimated_document_count(),
+            'file_tracking_count': db.file_tracking.estimated_document_count(),
+            'tasks_count': db.tasks.estimated_document_count(),
+            'profile_building_count': db.profile_building.estimated_document_count(),
+            'files_with_hash': 0,
             'duplicate_groups': 0,
             'total_duplicates': 0
         }
         
-        # Count duplicates
-        hash_groups = {}
-        files_with_hash = list(db.permit_files.find({'file_hash': {'$exists': True}}))
-        
-        for file_doc in files_with_hash:
-            file_hash = file_doc.get('file_hash')
-            if file_hash not in hash_groups:
-                hash_groups[file_hash] = []
-            hash_groups[file_hash].append(file_doc)
-        
-        for file_hash, files in hash_groups.items():
-            if len(files) > 1:
-                stats['duplicate_groups'] += 1
-                stats['total_duplicates'] += len(files) - 1
+        # Count hashed files and duplicates in one pass over the hashed files
+        facets = db.permit_files.aggregate([
+            {'$match': {'file_hash': {'$exists': True}}},
+            {'$facet': {
+                'with_hash': [{'$count': 'count'}],
+                'duplicates': [
+                    {'$group': {'_id': '$file_hash', 'count': {'$sum': 1}}},
+                    {'$match': {'count': {'$gt': 1}}},
+                    {'$group': {'_id': None, 'groups': {'$sum': 1}, 'files': {'$sum': '$count'}}},
+                ],
+            }},
+        ], allowDiskUse=True)
+        for facet in facets:
+            for totals in facet['with_hash']:
+                stats['files_with_hash'] = totals['count']
+            for totals in facet['duplicates']:
+                stats['duplicate_groups'] = totals['groups']
+                stats['total_duplicates'] = totals['files'] - totals['groups']
         
         return stats
 
@@ -7,12 +7,59 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 from enum import Enum
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 from app.db.mongodb import get_db
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# notifications indexes: one per branch of the get_user_notifications $or, each
+# matching its created_at sort, plus TTL removal of expired notifications
+NOTIFICATION_INDEXES = [
+    ([("recipient_code", 1), ("created_at", -1)], {}),
+    ([("recipient_type", 1), ("created_at", -1)], {}),
+    ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+]
+
+# SLA breach notification bodies, filled with str.format_map
+SLA_BREACH_MANAGER_TEMPLATE = """
+Dear Manager,
+
+This is an automated alert that a task has exceeded the SLA threshold:
+
+File ID: {file_id}
+Stage: {stage}
+Assigned to: {employee_name} ({employee_code})
+Current Duration: {duration_str}
+Threshold: {threshold_minutes} minutes
+Over by: {over_str}
+
+The task is now {over_str} over the expected time limit. Please take appropriate action to ensure timely completion.
+
+You can view the details in the Stage Tracking Dashboard.
+
+Regards,
+Task Assignment System
+""".strip()
+
+SLA_BREACH_ESCALATION_TEMPLATE = """
+URGENT ESCALATION: Task SLA Breach Requires Immediate Attention
+
+File ID: {file_id}
+Stage: {stage}
+Employee: {employee_name} ({employee_code})
+Duration: {duration_str} (Over by: {over_str})
+
+This task requires immediate escalation and intervention. The assigned employee has significantly exceeded the time threshold.
+
+Please review and take necessary action immediately.
+
+Regards,
+Task Assignment System
+""".strip()
+
 
 class NotificationType(str, Enum):
     SLA_BREACH = "sla_breach"
@@ -45,6 +92,15 @@ class NotificationService:
     
     def __init__(self):
         self.db = get_db()
+        self._ensure_indexes()
+    
+    def _ensure_indexes(self):
+        """Ensure notifications indexes exist"""
+        try:
+            for keys, options in NOTIFICATION_INDEXES:
+                self.db.notifications.create_index(keys, **options)
+        except Exception as e:
+            logger.warning(f"Failed to ensure notifications indexes: {str(e)}")
     
     def check_and_send_sla_escalations(self, breaches: List[Dict] = None) -> Dict[str, Any]:
         """Check for SLA breaches and send escalation notifications"""
@@ -56,10 +112,36 @@ class NotificationService:
                 return {"success": False, "error": "No breaches provided", "notifications_sent": 0}
             
             sent_notifications = []
+            # Written once after the loop: in-app notification docs and (file_id, stage, sent_at)
+            pending_in_app: List[Dict] = []
+            sent_escalations = []
+            # Per breach: (escalation, notifications, ids of its in-app docs), settled after the insert
+            breach_results = []
+            
+            # Prefetch breach employees, then their managers (by code or name), in two queries
+            breach_codes = list({breach["employee_code"] for breach in breaches})
+            employees_by_code = {
+                employee["employee_code"]: employee
+                for employee in self.db.employee.find({"employee_code": {"$in": breach_codes}})
+            }
+            manager_refs = list({
+                ref
+                for employee in employees_by_code.values()
+                for ref in (employee.get("reporting_manager"), employee.get("reporting_manager_2"))
+                if ref
+            })
+            managers_by_name = {}
+            if manager_refs:
+                for manager in self.db.employee.find({"$or": [
+                    {"employee_code": {"$in": manager_refs}},
+                    {"employee_name": {"$in": manager_refs}},
+                ]}):
+                    employees_by_code.setdefault(manager.get("employee_code"), manager)
+                    managers_by_name.setdefault(manager.get("employee_name"), manager)
             
             for breach in breaches:
                 # Get employee details to find manager
-                employee = self.db.employee.find_one({"employee_code": breach["employee_code"]})
+                employee = employees_by_code.get(breach["employee_code"])
                 if not employee:
                     logger.warning(f"Employee {breach['employee_code']} not found for escalation")
                     continue
@@ -69,17 +151,35 @@ class NotificationService:
                 manager = None
                 if manager_code:
                     # Try to find manager by code or name
-                    manager = self.db.employee.find_one({"employee_code": manager_code})
-                    if not manager:
-                        # Try by name
-                        manager = self.db.employee.find_one({"employee_name": manager_code})
+                    manager = employees_by_code.get(manager_code) or managers_by_name.get(manager_code)
                 
-                # Send notifications
-                notifications_sent = self._send_sla_breach_notifications(breach, employee, manager)
+                # Send notifications, all stamped with the same time; the breach's
+                # in-app documents come back in its own list, kept in breach order
+                now = datetime.utcnow()
+                in_app_docs: List[Dict] = []
+                notifications_sent = self._send_sla_breach_notifications(
+                    breach, employee, manager, now, in_app_docs, employees_by_code
+                )
+                pending_in_app.extend(in_app_docs)
+                breach_results.append((
+                    (breach["file_id"], breach["current_stage"], now),
+                    notifications_sent,
+                    {doc["_id"] for doc in in_app_docs},
+                ))
+            
+            failed_ids = self._store_in_app_notifications(pending_in_app)
+            for escalation, notifications_sent, doc_ids in breach_results:
+                if doc_ids & failed_ids:
+                    # In-app notice was never stored: don't report it, and leave the
+                    # escalation unmarked so the next run retries it
+                    sent_notifications.extend(n for n in notifications_sent if n["channel"] != "in_app")
+                    continue
                 sent_notifications.extend(notifications_sent)
                 
                 # Mark escalation as sent in tracking
-                self._mark_escalation_sent(breach["file_id"], breach["current_stage"])
+                sent_escalations.append(escalation)
+            
+            self._mark_escalations_sent(sent_escalations)
             
             return {
                 "success": True,
@@ -96,9 +196,30 @@ class NotificationService:
                 "notifications_sent": 0
             }
     
-    def _send_sla_breach_notifications(self, breach: Dict, employee: Dict, manager: Optional[Dict]) -> List[Dict]:
+    def _store_in_app_notifications(self, docs: List[Dict]) -> set:
+        """insert_many the pending in-app notification docs; returns the _ids that were not stored"""
+        if not docs:
+            return set()
+        try:
+            self.db.notifications.insert_many(docs, ordered=False)
+            return set()
+        except BulkWriteError as e:
+            failed = {docs[error["index"]]["_id"] for error in e.details.get("writeErrors", [])}
+            logger.error(f"Failed to store {len(failed)} of {len(docs)} in-app notifications: {str(e)}")
+            return failed
+        except Exception as e:
+            logger.error(f"Failed to store {len(docs)} in-app notifications: {str(e)}")
+            return {doc["_id"] for doc in docs}
+    
+    def _send_sla_breach_notifications(self, breach: Dict, employee: Dict, manager: Optional[Dict],
+                                       now: Optional[datetime] = None,
+                                       pending_in_app: Optional[List[Dict]] = None,
+                                       employees_by_code: Optional[Dict[str, Dict]] = None) -> List[Dict]:
         """Send notifications for SLA breach"""
         notifications = []
+        now = now or datetime.utcnow()
+        now_iso = now.isoformat()
+        manager_code = employee.get("reporting_manager", "")
         
         # Prepare message data
         message_data = {
@@ -124,19 +245,22 @@ class NotificationService:
                 priority="high"
             )
             
-            result = self._send_notification(manager_notification)
+            result = self._send_notification(manager_notification, now)
             if result["success"]:
                 notifications.append({
                     "type": "manager_notification",
                     "recipient": manager.get("employee_name", "Unknown Manager"),
                     "channel": "email",
-                    "sent_at": datetime.utcnow().isoformat()
+                    "sent_at": now_iso
                 })
         
         # 2. Notify reporting manager if different from manager
         reporting_manager_code = employee.get("reporting_manager_2", "")
         if reporting_manager_code and reporting_manager_code != manager_code:
-            reporting_manager = self.db.employee.find_one({"employee_code": reporting_manager_code})
+            if employees_by_code is not None:
+                reporting_manager = employees_by_code.get(reporting_manager_code)
+            else:
+                reporting_manager = self.db.employee.find_one({"employee_code": reporting_manager_code})
             if reporting_manager:
                 reporting_notification = NotificationMessage(
                     recipient=reporting_manager.get("employee_email", ""),
@@ -148,13 +272,13 @@ class NotificationService:
                     priority="urgent"
                 )
                 
-                result = self._send_notification(reporting_notification)
+                result = self._send_notification(reporting_notification, now)
                 if result["success"]:
                     notifications.append({
                         "type": "reporting_manager_notification",
                         "recipient": reporting_manager.get("employee_name", "Unknown Reporting Manager"),
                         "channel": "email",
-                        "sent_at": datetime.utcnow().isoformat()
+                        "sent_at": now_iso
                     })
         
         # 3. Log in-app notification for the employee
@@ -168,13 +292,13 @@ class NotificationService:
             priority="high"
         )
         
-        result = self._send_notification(employee_notification)
+        result = self._send_notification(employee_notification, now, pending_in_app)
         if result["success"]:
             notifications.append({
                 "type": "employee_notification",
                 "recipient": breach["employee_name"],
                 "channel": "in_app",
-                "sent_at": datetime.utcnow().isoformat()
+                "sent_at": now_iso
             })
         
         return notifications
@@ -188,52 +312,19 @@ class NotificationService:
         duration_str = f"{data['duration_minutes']} minutes"
         over_str = f"{hours}h {minutes}m" if hours > 0 else f"{minutes} minutes"
         
-        if manager_type:
-            return f"""
-Dear Manager,
-
-This is an automated alert that a task has exceeded the SLA threshold:
-
-File ID: {data['file_id']}
-Stage: {data['stage']}
-Assigned to: {data['employee_name']} ({data['employee_code']})
-Current Duration: {duration_str}
-Threshold: {data['threshold_minutes']} minutes
-Over by: {over_str}
-
-The task is now {over_str} over the expected time limit. Please take appropriate action to ensure timely completion.
-
-You can view the details in the Stage Tracking Dashboard.
-
-Regards,
-Task Assignment System
-            """.strip()
-        else:
-            return f"""
-URGENT ESCALATION: Task SLA Breach Requires Immediate Attention
-
-File ID: {data['file_id']}
-Stage: {data['stage']}
-Employee: {data['employee_name']} ({data['employee_code']})
-Duration: {duration_str} (Over by: {over_str})
-
-This task requires immediate escalation and intervention. The assigned employee has significantly exceeded the time threshold.
-
-Please review and take necessary action immediately.
-
-Regards,
-Task Assignment System
-            """.strip()
+        template = SLA_BREACH_MANAGER_TEMPLATE if manager_type else SLA_BREACH_ESCALATION_TEMPLATE
+        return template.format_map({**data, "duration_str": duration_str, "over_str": over_str})
     
-    def _send_notification(self, notification: NotificationMessage) -> Dict[str, Any]:
+    def _send_notification(self, notification: NotificationMessage, now: Optional[datetime] = None,
+                           pending_in_app: Optional[List[Dict]] = None) -> Dict[str, Any]:
         """Send notification through the specified channel"""
         try:
             if notification.channel == NotificationChannel.EMAIL:
-                return self._send_email_notification(notification)
+                return self._send_email_notification(notification, now)
             elif notification.channel == NotificationChannel.IN_APP:
-                return self._send_in_app_notification(notification)
+                return self._send_in_app_notification(notification, now, pending_in_app)
             elif notification.channel == NotificationChannel.WEBHOOK:
-                return self._send_webhook_notification(notification)
+                return self._send_webhook_notification(notification, now)
             else:
                 logger.warning(f"Notification channel {notification.channel} not implemented")
                 return {"success": False, "error": "Channel not implemented"}
@@ -242,7 +333,7 @@ Task Assignment System
             logger.error(f"Failed to send {notification.channel} notification: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    def _send_email_notification(self, notification: NotificationMessage) -> Dict[str, Any]:
+    def _send_email_notification(self, notification: NotificationMessage, now: Optional[datetime] = None) -> Dict[str, Any]:
         """Send email notification (placeholder implementation)"""
         # TODO: Implement actual email sending (SMTP, SendGrid, etc.)
         logger.info(f"EMAIL to {notification.recipient}: {notification.subject}")
@@ -253,12 +344,14 @@ Task Assignment System
             "success": True,
             "channel": "email",
             "recipient": notification.recipient,
-            "sent_at": datetime.utcnow().isoformat()
+            "sent_at": (now or datetime.utcnow()).isoformat()
         }
     
-    def _send_in_app_notification(self, notification: NotificationMessage) -> Dict[str, Any]:
-        """Store in-app notification in database"""
+    def _send_in_app_notification(self, notification: NotificationMessage, now: Optional[datetime] = None,
+                                  pending: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Store in-app notification in database, or append it to pending for a later insert_many"""
         try:
+            now = now or datetime.utcnow()
             notification_doc = {
                 "recipient_code": notification.recipient,
                 "recipient_type": notification.recipient_type,
@@ -269,42 +362,51 @@ Task Assignment System
                 "data": notification.data,
                 "priority": notification.priority,
                 "read": False,
-                "created_at": datetime.utcnow(),
-                "expires_at": datetime.utcnow() + timedelta(days=7)
+                "created_at": now,
+                "expires_at": now + timedelta(days=7)
             }
             
             # Insert into notifications collection
-            self.db.notifications.insert_one(notification_doc)
+            if pending is not None:
+                notification_doc["_id"] = ObjectId()
+                pending.append(notification_doc)
+            else:
+                self.db.notifications.insert_one(notification_doc)
             
             return {
                 "success": True,
                 "channel": "in_app",
                 "recipient": notification.recipient,
                 "notification_id": str(notification_doc["_id"]),
-                "sent_at": datetime.utcnow().isoformat()
+                "sent_at": now.isoformat()
             }
             
         except Exception as e:
             logger.error(f"Failed to store in-app notification: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    def _send_webhook_notification(self, notification: NotificationMessage) -> Dict[str, Any]:
+    def _send_webhook_notification(self, notification: NotificationMessage, now: Optional[datetime] = None) -> Dict[str, Any]:
         """Send webhook notification (placeholder implementation)"""
         # TODO: Implement webhook calls to external systems
         logger.info(f"WEBHOOK notification: {notification.subject}")
         return {
             "success": True,
             "channel": "webhook",
-            "sent_at": datetime.utcnow().isoformat()
+            "sent_at": (now or datetime.utcnow()).isoformat()
         }
     
-    def _mark_escalation_sent(self, file_id: str, stage: str) -> bool:
-        """Mark escalation as sent in stage history"""
+    def _mark_escalations_sent(self, escalations: List[tuple]) -> bool:
+        """Mark escalations, given as (file_id, stage, sent_at), as sent in stage history"""
+        if not escalations:
+            return True
         try:
-            self.db.stage_history.update_one(
-                {"file_id": file_id, "stage": stage},
-                {"$set": {"escalation_sent": True, "escalation_sent_at": datetime.utcnow()}}
-            )
+            self.db.stage_history.bulk_write([
+                UpdateOne(
+                    {"file_id": file_id, "stage": stage},
+                    {"$set": {"escalation_sent": True, "escalation_sent_at": sent_at}}
+                )
+                for file_id, stage, sent_at in escalations
+            ], ordered=False)
             return True
         except Exception as e:
             logger.error(f"Failed to mark escalation sent: {str(e)}")
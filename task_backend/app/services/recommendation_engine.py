@@ -6,6 +6,11 @@ Updated Recommendation Engine for Employee Task Assignment
 """
 
 from typing import List, Dict, Any, Optional, Tuple
+import heapq
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import numpy as np
 from datetime import datetime, timedelta
 from pydantic import BaseModel
@@ -21,6 +26,117 @@ from app.models.stage_flow import FileStage
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# _calculate_keyword_score rules per normalized skill category:
+# (category, task keywords that trigger it, whether a skill containing any task keyword
+#  scores 0.15, fallback (word required in the task text or None, word in the skill,
+#  weight) tests tried in order otherwise)
+KEYWORD_SCORE_RULES = (
+    ("structural_design", frozenset({"structural", "design"}), True,
+     (("structural", "structural", 0.2), ("design", "design", 0.1))),
+    ("electrical_design", frozenset({"electrical", "solar", "pv"}), True,
+     (("electrical", "electrical", 0.2),)),
+    ("coordination", frozenset({"coordination"}), False,
+     ((None, "coordination", 0.15),)),
+)
+
+# Normalized skill categories read by _calculate_keyword_score
+KEYWORD_SCORE_CATEGORIES = tuple(rule[0] for rule in KEYWORD_SCORE_RULES)
+
+# Task keyword groups: any substring hit adds both the group name and the keyword
+TASK_KEYWORD_GROUPS = (
+    # Structural design keywords
+    ("structural", ("structural", "structure", "steel", "building", "rafter",
+                    "foundation", "column", "truss", "roof", "concrete",
+                    "beam", "load", "cad", "drawing")),
+    # Electrical design keywords
+    ("electrical", ("electrical", "pv", "solar", "photovoltaic", "inverter",
+                    "string", "earthing", "cable", "switchgear", "panel")),
+    # Coordination keywords
+    ("coordination", ("coordination", "coordinate", "coordinating")),
+)
+
+# Task-history keywords for extract_task_relevance: label -> variants
+TASK_RELEVANCE_KEYWORDS = (
+    ("design", ("design", "designing", "designed")),
+    ("analysis", ("analysis", "analyzing", "analyzed")),
+    ("solar", ("solar", "pv", "photovoltaic")),
+    ("structural", ("structural", "structure")),
+    ("electrical", ("electrical", "electrics")),
+    ("autocad", ("autocad", "cad")),
+    ("preparation", ("preparation", "prepared")),
+)
+
+# Task descriptions repeat across subtasks, so keyword extraction is memoized
+TASK_KEYWORD_CACHE_SIZE = 4096
+
+# Code inside the first parentheses of "Name (CODE)"
+TEAM_LEAD_CODE_RE = re.compile(r"\(([^)]+)\)")
+
+# Employee fields loaded for recommendations
+EMPLOYEE_PROJECTION = {
+    "_id": 0,
+    "skills": 1,
+    "technical_skills": 1,
+    "raw_technical_skills": 1,
+    "raw_strength_expertise": 1,
+    "kekaemployeenumber": 1,
+    "employee_name": 1,
+    "current_role": 1,
+    "shift": 1,
+    "experience_years": 1,
+    "status_1": 1,
+    "reporting_manager": 1,
+    "List of task assigned": 1,
+    "Special Task": 1,
+    "embedding": 1,
+}
+
+# Free-text employee fields searched case-insensitively, lowercased once per cache load
+LOWERED_TEXT_FIELDS = {
+    "List of task assigned": "_task_history_lower",
+    "Special Task": "_special_tasks_lower",
+    "raw_technical_skills": "_raw_skills_lower",
+}
+
+# Task fields loaded for recommendations
+TASK_PROJECTION = {
+    "_id": 0,
+    "task_id": 1,
+    "title": 1,
+    "description": 1,
+    "assigned_to": 1,
+    "employee_code": 1,
+    "status": 1,
+    "assigned_at": 1,
+    "due_date": 1,
+    "skills_required": 1,
+}
+
+# Large rosters load their tasks as parallel per-shard queries (one cursor each)
+TASK_QUERY_SHARDS = 4
+TASK_QUERY_SHARD_MIN_EMPLOYEES = 200
+
+# Indexes behind employee loading: permanent employees by reporting manager, and the
+# task lookup (one per $or branch, matching its assigned_at sort)
+RECOMMENDATION_INDEXES = {
+    "employee": [
+        [("status_1", 1), ("reporting_manager", 1)],
+    ],
+    "tasks": [
+        [("assigned_to", 1), ("assigned_at", -1)],
+        [("employee_code", 1), ("assigned_at", -1)],
+    ],
+}
+
+
+def _relevance_groups(text_lower: str) -> tuple:
+    """TASK_RELEVANCE_KEYWORDS labels with a variant in the lowercased text, in table order"""
+    return tuple(
+        key for key, variants in TASK_RELEVANCE_KEYWORDS
+        if any(v in text_lower for v in variants)
+    )
+
+
 class EmployeeRecommendation(BaseModel):
     """Employee recommendation model"""
     employee_code: str
@@ -45,15 +161,34 @@ class RecommendationEngine:
         self.db = get_db()
         self.embedding_service = VertexAIEmbeddingService()
         self.skill_normalizer = SkillNormalizer()
+        # Per cache key: (employees, row-normalized float32 embedding matrix in the same
+        # row order). Replaced as one tuple, never mutated, so concurrent requests
+        # (get_recommendations_async threads) always see rows and matrix that line up.
         self._employee_cache = {}
+        # Serializes reloads and task refreshes of the cache
+        self._cache_lock = threading.Lock()
         self._cache_timestamp = None
         self._cache_ttl = 1800  # 30 minutes (optimized for employee data)
+        # Task assignments change far more often than profiles/embeddings: refresh them
+        # on their own, shorter TTL without re-reading employee documents
+        self._task_cache_timestamps = {}
+        self._task_cache_ttl = 300  # 5 minutes
+        self._ensure_indexes()
+    
+    def _ensure_indexes(self):
+        """Ensure indexes used by employee loading exist"""
+        try:
+            for collection, index_list in RECOMMENDATION_INDEXES.items():
+                for index in index_list:
+                    self.db[collection].create_index(index)
+        except Exception as e:
+            logger.warning(f"Failed to ensure recommendation indexes: {e}")
     
     def _extract_team_lead_code(self, team_lead: str) -> Optional[str]:
         """Extract team lead code from name string."""
         if not team_lead:
             return None
-        match = re.search(r"\(([^)]+)\)", team_lead)
+        match = TEAM_LEAD_CODE_RE.search(team_lead)
         return match.group(1).strip() if match else None
     
     def _get_team_lead_from_file(self, file_id: str) -> Optional[str]:
@@ -69,7 +204,7 @@ class RecommendationEngine:
                 latest_task = tasks[0]
                 team_lead = latest_task.get("assigned_to_lead")
                 if team_lead:
-                    print(f"[DEBUG] Found team lead from existing tasks: {team_lead}")
+                    logger.debug(f"Found team lead from existing tasks: {team_lead}")
                     return team_lead
 
             # For new files, use ZIP/state mapping like auto-assign does.
@@ -88,12 +223,12 @@ class RecommendationEngine:
             )
             
             if not permit_file:
-                print(f"[DEBUG] No permit file found for: {file_id}")
+                logger.debug(f"No permit file found for: {file_id}")
                 return None
 
             locked_lead = permit_file.get("locked_team_lead") or permit_file.get("assigned_to_lead")
             if locked_lead and locked_lead != "SYSTEM":
-                print(f"[DEBUG] Found locked team lead from permit file: {locked_lead}")
+                logger.debug(f"Found locked team lead from permit file: {locked_lead}")
                 return locked_lead
 
             detected_zip = permit_file.get("detected_zip")
@@ -104,14 +239,14 @@ class RecommendationEngine:
             if not detected_zip or not detected_state:
                 file_path = (permit_file.get("file_info") or {}).get("file_path")
                 if not file_path:
-                    print(f"[DEBUG] No file path found for permit file: {file_id}")
+                    logger.debug(f"No file path found for permit file: {file_id}")
                     return None
 
                 try:
                     with open(file_path, "rb") as f:
                         pdf_bytes = f.read()
                 except Exception as e:
-                    print(f"[DEBUG] Failed to read PDF from disk for {file_id}: {e}")
+                    logger.debug(f"Failed to read PDF from disk for {file_id}: {e}")
                     return None
 
                 from app.api.v1.routers.zip_assign import (
@@ -121,15 +256,15 @@ class RecommendationEngine:
 
                 detected_zip = _extract_zip_from_pdf_first_page(pdf_bytes)
                 if not detected_zip:
-                    print(f"[DEBUG] Could not extract ZIP from PDF for file: {file_id}")
+                    logger.debug(f"Could not extract ZIP from PDF for file: {file_id}")
                     return None
 
                 detected_state = _validate_zip_and_get_state(detected_zip)
                 if not detected_state:
-                    print(f"[DEBUG] ZIP {detected_zip} did not map to any configured state")
+                    logger.debug(f"ZIP {detected_zip} did not map to any configured state")
                     return None
 
-                print(f"[DEBUG] Derived ZIP/state for file {file_id}: {detected_zip} / {detected_state}")
+                logger.debug(f"Derived ZIP/state for file {file_id}: {detected_zip} / {detected_state}")
 
                 # Cache on permit file for next time (best-effort)
                 try:
@@ -148,10 +283,10 @@ class RecommendationEngine:
 
             team_lead = _choose_team_lead_for_state(detected_state)
             if not team_lead:
-                print(f"[DEBUG] No team lead found for state: {detected_state}")
+                logger.debug(f"No team lead found for state: {detected_state}")
                 return None
 
-            print(f"[DEBUG] Selected team lead for state {detected_state}: {team_lead}")
+            logger.debug(f"Selected team lead for state {detected_state}: {team_lead}")
 
             # Cache locked lead (best-effort)
             try:
@@ -170,159 +305,183 @@ class RecommendationEngine:
             return team_lead
             
         except Exception as e:
-            print(f"[DEBUG] Error getting team lead from file: {e}")
+            logger.debug(f"Error getting team lead from file: {e}")
             return None
     
     # ===================== LOAD EMPLOYEES ====
     
     def load_employees(self, team_lead_code: Optional[str] = None):
         """Load employees with new structure and current task information"""
+        return self._load_snapshot(team_lead_code)[0]
+    
+    def _load_snapshot(self, team_lead_code: Optional[str] = None) -> Tuple[List[Dict], np.ndarray]:
+        """Cached (employees, embedding matrix) for a team lead, reloading or refreshing tasks when stale"""
         cache_key = team_lead_code or "ALL"
-
-        if cache_key in self._employee_cache and self._cache_valid():
-            return self._employee_cache[cache_key]
         
+        snapshot = self._employee_cache.get(cache_key)
+        if snapshot is not None and self._cache_valid() and self._tasks_fresh(cache_key):
+            return snapshot
+        
+        with self._cache_lock:
+            # Another thread may have refreshed this key while we waited for the lock
+            snapshot = self._employee_cache.get(cache_key)
+            if snapshot is not None and self._cache_valid():
+                if not self._tasks_fresh(cache_key):
+                    # Copy-on-write: requests still scoring the old rows keep a consistent view
+                    employees = [dict(emp) for emp in snapshot[0]]
+                    self._attach_current_tasks(employees)
+                    snapshot = (employees, snapshot[1])
+                    self._employee_cache[cache_key] = snapshot
+                    self._task_cache_timestamps[cache_key] = datetime.utcnow()
+                return snapshot
+            
+            snapshot = self._load_employees_uncached(team_lead_code)
+            self._employee_cache[cache_key] = snapshot
+            self._cache_timestamp = datetime.utcnow()
+            self._task_cache_timestamps[cache_key] = self._cache_timestamp
+            return snapshot
+    
+    def _tasks_fresh(self, cache_key: str) -> bool:
+        """Whether the cached task information for a cache key is within _task_cache_ttl"""
+        loaded_at = self._task_cache_timestamps.get(cache_key)
+        return bool(loaded_at) and datetime.utcnow() - loaded_at < timedelta(seconds=self._task_cache_ttl)
+    
+    def _load_employees_uncached(self, team_lead_code: Optional[str]) -> Tuple[List[Dict], np.ndarray]:
+        """Query employees and their tasks, and build the embedding matrix"""
         # If no team lead specified, load all employees
         if not team_lead_code:
-            employees = list(self.db.employee.find(
-                {"status_1": "Permanent"},
-                {
-                    "_id": 0,
-                    "skills": 1,
-                    "technical_skills": 1,
-                    "raw_technical_skills": 1,
-                    "raw_strength_expertise": 1,
-                    "kekaemployeenumber": 1,
-                    "employee_name": 1,
-                    "current_role": 1,
-                    "shift": 1,
-                    "experience_years": 1,
-                    "status_1": 1,
-                    "reporting_manager": 1,
-                    "List of task assigned": 1,
-                    "Special Task": 1,
-                    "embedding": 1,
-                }
-            ))
+            employees = list(self.db.employee.find({"status_1": "Permanent"}, EMPLOYEE_PROJECTION))
         else:
             # For team-specific recommendations, use the same logic as get_employees_grouped_by_team_lead
             # Team assignment is based on reporting_manager field
-            print(f"[DEBUG] Loading employees for team lead: {team_lead_code}")
+            logger.debug(f"Loading employees for team lead: {team_lead_code}")
             
-            # Get all permanent employees
-            all_employees = list(self.db.employee.find(
-                {"status_1": "Permanent"},
+            # Handle both formats: "0083" and "Shivam Kumar (0083)" (code in the first parentheses)
+            employees = list(self.db.employee.find(
                 {
-                    "_id": 0,
-                    "skills": 1,
-                    "technical_skills": 1,
-                    "raw_technical_skills": 1,
-                    "raw_strength_expertise": 1,
-                    "kekaemployeenumber": 1,
-                    "employee_name": 1,
-                    "current_role": 1,
-                    "shift": 1,
-                    "experience_years": 1,
-                    "status_1": 1,
-                    "reporting_manager": 1,
-                    "List of task assigned": 1,
-                    "Special Task": 1,
-                    "embedding": 1,
-                }
+                    "status_1": "Permanent",
+                    "$or": [
+                        {"reporting_manager": team_lead_code},
+                        {"reporting_manager": {"$regex": rf"^[^(]*\(\s*{re.escape(team_lead_code)}\s*\)"}},
+                    ],
+                },
+                EMPLOYEE_PROJECTION
             ))
             
-            print(f"[DEBUG] Found {len(all_employees)} total employees")
-            
-            # Filter employees by reporting_manager (same logic as get_employees_grouped_by_team_lead)
-            employees = []
-            for emp in all_employees:
-                reporting_manager = emp.get("reporting_manager", "")
-                
-                # Handle both formats: "0083" and "Shivam Kumar (0083)"
-                if reporting_manager == team_lead_code:
-                    employees.append(emp)
-                    print(f"[DEBUG] Employee {emp.get('employee_name')} reports to {team_lead_code} (direct code match)")
-                elif team_lead_code in reporting_manager:
-                    # Extract code from "Shivam Kumar (0083)" format
-                    import re
-                    match = re.search(r"\(([^)]+)\)", reporting_manager)
-                    if match:
-                        extracted_code = match.group(1).strip()
-                        if extracted_code == team_lead_code:
-                            employees.append(emp)
-                            print(f"[DEBUG] Employee {emp.get('employee_name')} reports to {team_lead_code} (extracted from {reporting_manager})")
-            
-            print(f"[DEBUG] Found {len(employees)} employees under team lead {team_lead_code}")
+            logger.debug(f"Found {len(employees)} employees under team lead {team_lead_code}")
+        
+        self._attach_current_tasks(employees)
         
-        # Load current tasks for all employees
+        # Skills are static for the cache lifetime: normalize once, not per scoring step
+        normalized_skills = self.skill_normalizer.normalize_batch(employees)
+        for emp, skills in zip(employees, normalized_skills):
+            emp["_normalized_skills"] = skills
+            emp["_keyword_score_key"] = self._keyword_score_key(emp["_normalized_skills"])
+            for field, lowered_field in LOWERED_TEXT_FIELDS.items():
+                emp[lowered_field] = str(emp.get(field) or "").lower()
+            # Relevance groups in the (static) history texts, so requests only do set lookups
+            emp["_history_relevance"] = frozenset(_relevance_groups(emp["_task_history_lower"]))
+            emp["_special_relevance"] = frozenset(_relevance_groups(emp["_special_tasks_lower"]))
+        
+        # Embeddings live only in the float32 matrix; drop the per-employee float lists
+        matrix = self._build_embedding_matrix(employees)
+        for emp in employees:
+            emp.pop("embedding", None)
+
+        return employees, matrix
+    
+    def _attach_current_tasks(self, employees: List[Dict]) -> None:
+        """Load current tasks for all employees and attach task information to each"""
         employee_numbers = [emp.get("kekaemployeenumber") for emp in employees]
         current_tasks = self._load_current_tasks(employee_numbers)
         
-        # Attach task information to each employee
         for emp in employees:
             emp_number = emp.get("kekaemployeenumber")
             emp["current_tasks"] = current_tasks.get(emp_number, [])
             emp["active_task_count"] = len([t for t in current_tasks.get(emp_number, []) if t.get("status") == "ASSIGNED"])
             emp["total_task_count"] = len(current_tasks.get(emp_number, []))
-        
-        self._employee_cache[cache_key] = employees
-        self._cache_timestamp = datetime.utcnow()
-
-        return employees
+    
+    def _build_embedding_matrix(self, employees: List[Dict]) -> np.ndarray:
+        """Stack employee embeddings into one row-normalized float32 matrix; zero rows for missing embeddings"""
+        dim = next((len(emp["embedding"]) for emp in employees if emp.get("embedding")), 0)
+        matrix = np.zeros((len(employees), dim), dtype=np.float32)
+        for row, emp in enumerate(employees):
+            embedding = emp.get("embedding")
+            if embedding and len(embedding) == dim:
+                matrix[row] = embedding
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+    
+    def _embedding_similarities(self, matrix: np.ndarray, employees: List[Dict], task_embedding: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the (normalized) task embedding to every employee, in one matrix-vector product"""
+        if matrix.shape != (len(employees), task_embedding.shape[0]):
+            return np.zeros(len(employees), dtype=np.float32)
+        return matrix @ task_embedding
     
     def _load_current_tasks(self, employee_codes: List[str]) -> Dict[str, List[Dict]]:
         """Load current tasks for the given employee codes"""
         if not employee_codes:
             return {}
         
-        # Convert employee codes to task format (without leading zeros)
-        # Tasks store codes like '622' while employees store '0622'
-        task_codes = [code.lstrip('0') or '0' for code in employee_codes]
+        # Tasks store codes like '622' while employees store '0622': map both formats
+        # back to the employee code (first employee wins, as in a linear scan)
+        code_to_employee = {}
+        for code in employee_codes:
+            if code is None:
+                continue
+            code_to_employee.setdefault(code.lstrip('0') or '0', code)
+            code_to_employee.setdefault(code, code)
+        
+        # Shard by employee so each employee's tasks (and their order) come from one query
+        employees = list(dict.fromkeys(code_to_employee.values()))
+        shard_count = TASK_QUERY_SHARDS if len(employees) >= TASK_QUERY_SHARD_MIN_EMPLOYEES else 1
+        shard_of = {code: i % shard_count for i, code in enumerate(employees)}
+        shards = [dict() for _ in range(shard_count)]
+        for code, emp_code in code_to_employee.items():
+            shards[shard_of[emp_code]][code] = emp_code
+        
+        if shard_count == 1:
+            shard_results = [self._load_task_shard(shards[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=shard_count) as pool:
+                shard_results = list(pool.map(self._load_task_shard, shards))
+        
+        tasks_by_employee = {}
+        for shard_tasks in shard_results:
+            tasks_by_employee.update(shard_tasks)
         
+        logger.debug(f"Loaded all tasks for {len(tasks_by_employee)} employees")
+        return tasks_by_employee
+
+    def _load_task_shard(self, code_to_employee: Dict[str, str]) -> Dict[str, List[Dict]]:
+        """Load and group the tasks of one shard ({task code format: employee code})"""
         # Build combined code list: both stripped and original formats
-        all_codes = list(set(task_codes + employee_codes))
+        all_codes = list(code_to_employee)
         
         # Get all tasks for these employees (both active and completed)
         # Query both assigned_to and employee_code for backward compatibility
-        tasks = list(self.db.tasks.find(
+        tasks = self.db.tasks.find(
             {
                 "$or": [
                     {"assigned_to": {"$in": all_codes}},
                     {"employee_code": {"$in": all_codes}}
                 ]
             },
-            {
-                "_id": 0,
-                "task_id": 1,
-                "title": 1,
-                "description": 1,
-                "assigned_to": 1,
-                "employee_code": 1,
-                "status": 1,
-                "assigned_at": 1,
-                "due_date": 1,
-                "skills_required": 1
-            }
-        ).sort("assigned_at", -1))  # Most recent first
-        
-        # Group tasks by employee (convert back to employee code format with leading zeros)
+            TASK_PROJECTION
+        ).sort("assigned_at", -1)  # Most recent first
+        
+        # Group tasks by employee (convert back to employee code format with leading zeros).
+        # A task whose grouping code belongs to another shard is grouped by that shard.
         tasks_by_employee = {}
         for task in tasks:
             # Use assigned_to first, fall back to employee_code
             task_code = task.get("assigned_to") or task.get("employee_code")
             # Find the corresponding employee code with leading zeros
-            emp_code = None
-            for original_code in employee_codes:
-                if (original_code.lstrip('0') or '0') == task_code or original_code == task_code:
-                    emp_code = original_code
-                    break
-            
-            if emp_code and emp_code not in tasks_by_employee:
-                tasks_by_employee[emp_code] = []
+            emp_code = code_to_employee.get(task_code)
             if emp_code:
-                tasks_by_employee[emp_code].append(task)
+                tasks_by_employee.setdefault(emp_code, []).append(task)
         
-        print(f"[DEBUG] Loaded all tasks for {len(tasks_by_employee)} employees")
         return tasks_by_employee
 
     def _cache_valid(self) -> bool:
@@ -339,6 +498,11 @@ class RecommendationEngine:
     
     # ===================== RECOMMENDATIONS =====================
     
+    async def get_recommendations_async(self, **kwargs) -> List[EmployeeRecommendation]:
+        """get_recommendations for async endpoints: the Mongo and embedding I/O runs on a
+        worker thread, so concurrent requests overlap instead of blocking the event loop"""
+        return await asyncio.to_thread(self.get_recommendations, **kwargs)
+    
     def get_recommendations(
         self,
         task_description: str,
@@ -350,21 +514,21 @@ class RecommendationEngine:
     ) -> List[EmployeeRecommendation]:
         """Get task recommendations using hybrid scoring (embedding + keyword matching)"""
         
-        print(f"[DEBUG] Getting recommendations for: {task_description}")
-        print(f"[DEBUG] Team lead: {team_lead_code}")
-        print(f"[DEBUG] File ID: {file_id}, Current Stage: {current_file_stage}")
+        logger.debug(f"Getting recommendations for: {task_description}")
+        logger.debug(f"Team lead: {team_lead_code}")
+        logger.debug(f"File ID: {file_id}, Current Stage: {current_file_stage}")
         
         # Auto-detect team lead from file if not provided
         if not team_lead_code and file_id:
             team_lead_code = self._get_team_lead_from_file(file_id)
-            print(f"[DEBUG] Auto-detected team lead from file: {team_lead_code}")
+            logger.debug(f"Auto-detected team lead from file: {team_lead_code}")
         
-        # Load employees
-        employees = self.load_employees(team_lead_code)
-        print(f"[DEBUG] Loaded {len(employees)} employees")
+        # Load employees (with the embedding matrix from the same cache snapshot)
+        employees, embedding_matrix = self._load_snapshot(team_lead_code)
+        logger.debug(f"Loaded {len(employees)} employees")
         
         if not employees:
-            print("[DEBUG] No employees found")
+            logger.debug("No employees found")
             return []
         
         # Use enhanced stage detection with context
@@ -397,29 +561,33 @@ class RecommendationEngine:
 
         # Generate task embedding
         task_embedding = self.embed_text(task_description)
-        task_embedding = np.array(task_embedding)
+        task_embedding = np.asarray(task_embedding, dtype=np.float32)
         task_embedding = task_embedding / np.linalg.norm(task_embedding)
         
         # Extract keywords from task description for direct matching
         task_keywords = self._extract_task_keywords(task_description)
-        print(f"[DEBUG] Task keywords extracted: {task_keywords}")
+        logger.debug(f"Task keywords extracted: {task_keywords}")
         
-        # Calculate similarities
-        recommendations = []
+        # Calculate similarities (0.0 for employees without an embedding)
+        candidates: List[Tuple[float, Dict[str, Any]]] = []
+        # Skills come from a small fixed vocabulary, so many employees share a keyword score
+        keyword_scores: Dict[tuple, float] = {}
+        embedding_similarities = self._embedding_similarities(embedding_matrix, employees, task_embedding)
         
-        for emp in employees:
-            # Get employee embedding
-            emp_embedding = np.array(emp.get("embedding", []))
-            
-            # Calculate embedding similarity (if available)
-            embedding_similarity = 0.0
-            if len(emp_embedding) > 0:
-                emp_embedding = emp_embedding / np.linalg.norm(emp_embedding)
-                embedding_similarity = float(np.dot(task_embedding, emp_embedding))
+        # Per-employee debug lines are only formatted when DEBUG logging is on
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        
+        for emp, embedding_similarity in zip(employees, embedding_similarities.tolist()):
             
             # Calculate keyword-based skill match score
-            keyword_score = self._calculate_keyword_score(emp, task_keywords, task_description)
-            print(f"[DEBUG] Employee {emp.get('employee_name')}: keyword_score={keyword_score}, embedding_similarity={embedding_similarity}")
+            score_key = emp.get("_keyword_score_key")
+            keyword_score = keyword_scores.get(score_key) if score_key is not None else None
+            if keyword_score is None:
+                keyword_score = self._calculate_keyword_score(emp, task_keywords, task_description)
+                if score_key is not None:
+                    keyword_scores[score_key] = keyword_score
+            if debug_enabled:
+                logger.debug(f"Employee {emp.get('employee_name')}: keyword_score={keyword_score}, embedding_similarity={embedding_similarity}")
             
             # Calculate weighted hybrid score (40% keyword, 35% embedding, 15% experience, 10% workload)
             # Normalize scores to 0-1 range
@@ -452,14 +620,25 @@ class RecommendationEngine:
             
             # Use weighted score, but ensure minimum threshold
             similarity = max(weighted_score, 0.1)
-            print(f"[DEBUG] Employee {emp.get('employee_name')}: Weighted score={weighted_score:.3f} (keyword:{keyword_score:.3f}, embed:{embedding_similarity:.3f}, exp:{experience_score:.3f}, work:{workload_score:.3f}) -> final={similarity:.3f}")
+            if debug_enabled:
+                logger.debug(f"Employee {emp.get('employee_name')}: Weighted score={weighted_score:.3f} (keyword:{keyword_score:.3f}, embed:{embedding_similarity:.3f}, exp:{experience_score:.3f}, work:{workload_score:.3f}) -> final={similarity:.3f}")
             
             # Skip if below threshold (but be more lenient for team-specific recommendations)
             threshold = min_score if team_lead_code else 0.1  # Lower threshold for team-specific
             if similarity < threshold:
-                print(f"[DEBUG] Employee {emp.get('employee_name')}: Score {similarity} below threshold {threshold}")
+                if debug_enabled:
+                    logger.debug(f"Employee {emp.get('employee_name')}: Score {similarity} below threshold {threshold}")
                 continue
-            
+
+            candidates.append((similarity, emp))
+
+        # Select the top_k candidates in linear time before building the (costly)
+        # reasoning and response models. nlargest is stable, so ties keep the same
+        # order the previous full sort produced.
+        top_candidates = heapq.nlargest(top_k, candidates, key=lambda c: round(c[0], 3))
+
+        recommendations = []
+        for similarity, emp in top_candidates:
             # Build reasoning
             reasoning = self.build_reasoning(task_description, emp, similarity)
             
@@ -484,20 +663,17 @@ class RecommendationEngine:
             )
             
             recommendations.append(rec)
-        
-        # Sort by similarity and return top_k
-        recommendations.sort(key=lambda x: x.similarity_score, reverse=True)
 
         # If no one met the min_score threshold, still return a best-effort suggestion
         if not recommendations:
-            print(f"[DEBUG] No recommendations met threshold, using fallback assignment")
+            logger.debug(f"No recommendations met threshold, using fallback assignment")
             fallback = self.get_fallback_assignment(team_lead_code=team_lead_code, task_description=task_description)
             return [fallback] if fallback else []
         
         # For team-specific recommendations, if we have some results but fewer than top_k,
         # add fallback recommendations to fill the list
         if team_lead_code and len(recommendations) < top_k:
-            print(f"[DEBUG] Have {len(recommendations)} recommendations, adding fallback to reach {top_k}")
+            logger.debug(f"Have {len(recommendations)} recommendations, adding fallback to reach {top_k}")
             fallback = self.get_fallback_assignment(team_lead_code=team_lead_code, task_description=task_description)
             if fallback and fallback.employee_code not in [r.employee_code for r in recommendations]:
                 recommendations.append(fallback)
@@ -515,7 +691,8 @@ class RecommendationEngine:
             return []
 
         # Prefer lower experience, then lower active workload.
-        employees_sorted = sorted(
+        employees_sorted = heapq.nsmallest(
+            top_k,
             employees,
             key=lambda e: (
                 e.get("experience_years", 0) or 0,
@@ -524,7 +701,7 @@ class RecommendationEngine:
         )
 
         recommendations: List[EmployeeRecommendation] = []
-        for emp in employees_sorted[:top_k]:
+        for emp in employees_sorted:
             skills_match = self.extract_skills_match(emp)
             exp = emp.get("experience_years", 0) or 0
             active = emp.get("active_task_count", 0)
@@ -562,7 +739,8 @@ class RecommendationEngine:
             return []
 
         # Prefer higher experience, then lower active workload.
-        employees_sorted = sorted(
+        employees_sorted = heapq.nsmallest(
+            top_k,
             employees,
             key=lambda e: (
                 -(e.get("experience_years", 0) or 0),  # Negative for descending order
@@ -571,7 +749,7 @@ class RecommendationEngine:
         )
 
         recommendations: List[EmployeeRecommendation] = []
-        for emp in employees_sorted[:top_k]:
+        for emp in employees_sorted:
             skills_match = self.extract_skills_match(emp)
             exp = emp.get("experience_years", 0) or 0
             active = emp.get("active_task_count", 0)
@@ -631,7 +809,7 @@ class RecommendationEngine:
                 if any(keyword in description_lower for keyword in qc_keywords):
                     logger.info(f"File {file_id} is COMPLETED but QC task requested - allowing QC assignment")
                     # For QC work, prefer high experience
-                    employees.sort(key=lambda x: (-(x.get("experience_years", 0) or 0), x.get("active_task_count", 0)))
+                    rank_key = lambda x: (-(x.get("experience_years", 0) or 0), x.get("active_task_count", 0))
                     reasoning = "File is COMPLETED - Assigned QC task to most experienced employee."
                 else:
                     logger.info(f"File {file_id} is in COMPLETED stage - no recommendations until moved to QC")
@@ -639,19 +817,19 @@ class RecommendationEngine:
 
             # For PRELIMS-like work, prefer low experience (new joinees) first.
             if detected_stage == FileStage.PRELIMS:
-                employees.sort(key=lambda x: (x.get("experience_years", 0) or 0, x.get("active_task_count", 0)))
+                rank_key = lambda x: (x.get("experience_years", 0) or 0, x.get("active_task_count", 0))
                 reasoning = "Fallback assignment: No skill match found. Assigned to least experienced employee for PRELIMS work."
             elif detected_stage == FileStage.QC:
                 # For QC work, prefer high experience first when no skills match
-                employees.sort(key=lambda x: (-(x.get("experience_years", 0) or 0), x.get("active_task_count", 0)))
+                rank_key = lambda x: (-(x.get("experience_years", 0) or 0), x.get("active_task_count", 0))
                 reasoning = "Fallback assignment: No skill match found. Assigned to most experienced employee for QC review."
             else:
                 # Otherwise, least busy first.
-                employees.sort(key=lambda x: (x.get("active_task_count", 0), x.get("experience_years", 0) or 0))
+                rank_key = lambda x: (x.get("active_task_count", 0), x.get("experience_years", 0) or 0)
                 reasoning = "Fallback assignment: No skill match found. Assigned to least busy employee."
             
-            # Get the least busy employee
-            least_busy_emp = employees[0]
+            # Get the best-ranked employee (min() picks the first on ties, like a stable sort)
+            least_busy_emp = min(employees, key=rank_key)
             
             # Create fallback recommendation
             rec = EmployeeRecommendation(
@@ -677,13 +855,28 @@ class RecommendationEngine:
             logger.error(f"Error in fallback assignment: {str(e)}")
             return None
     
+    def _normalized_skills(self, employee: dict) -> Dict:
+        """Normalized skills precomputed by load_employees, or normalized now for other employee dicts"""
+        skills = employee.get("_normalized_skills")
+        if skills is None:
+            skills = self.skill_normalizer.normalize_employee_skills(employee)
+        return skills
+    
+    @staticmethod
+    def _lowered_text(employee: dict, field: str) -> str:
+        """Lowercased free-text field, precomputed by load_employees when available"""
+        lowered = employee.get(LOWERED_TEXT_FIELDS[field])
+        if lowered is None:
+            lowered = str(employee.get(field) or "").lower()
+        return lowered
+    
     def build_reasoning(self, task: str, employee: dict, similarity: float) -> str:
         """Build explanation for recommendation"""
         
         reasons = []
         
         # Skills-based reasoning using normalized skills
-        normalized_skills = self.skill_normalizer.normalize_employee_skills(employee)
+        normalized_skills = self._normalized_skills(employee)
         
         # Check for structural design skills
         if normalized_skills.get("structural_design"):
@@ -708,15 +901,15 @@ class RecommendationEngine:
             reasons.append(f"Experienced professional with {exp} years")
         
         # Task history reasoning
-        task_history = employee.get("List of task assigned", "")
-        if task_history and "design" in task_history.lower():
+        task_history = self._lowered_text(employee, "List of task assigned")
+        if "design" in task_history:
             reasons.append("Previous design experience")
         
         # Raw skills reasoning
-        raw_skills = employee.get("raw_technical_skills", "")
-        if raw_skills and "structural" in raw_skills.lower():
+        raw_skills = self._lowered_text(employee, "raw_technical_skills")
+        if "structural" in raw_skills:
             reasons.append("Structural engineering background")
-        if raw_skills and "design" in raw_skills.lower():
+        if "design" in raw_skills:
             reasons.append("Design experience")
         
         # If no specific reasons found, provide generic
@@ -729,7 +922,7 @@ class RecommendationEngine:
         """Extract skills in the expected format for frontend using skill normalizer"""
         
         # Use skill normalizer to properly extract and categorize skills
-        normalized_skills = self.skill_normalizer.normalize_employee_skills(employee)
+        normalized_skills = self._normalized_skills(employee)
         
         skills_match = {}
         
@@ -765,123 +958,90 @@ class RecommendationEngine:
     def extract_task_relevance(self, employee: dict, task: str) -> str:
         """Extract relevant task experience from employee history"""
         
-        task_lower = task.lower()
-        task_history = employee.get("List of task assigned", "").lower()
-        special_tasks = employee.get("Special Task", "").lower()
+        history_groups = employee.get("_history_relevance")
+        if history_groups is None:
+            history_groups = _relevance_groups(self._lowered_text(employee, "List of task assigned"))
+        special_groups = employee.get("_special_relevance")
+        if special_groups is None:
+            special_groups = _relevance_groups(self._lowered_text(employee, "Special Task"))
         
         relevant_tasks = []
         
-        # Check for relevant keywords
-        keywords = {
-            "design": ["design", "designing", "designed"],
-            "analysis": ["analysis", "analyzing", "analyzed"],
-            "solar": ["solar", "pv", "photovoltaic"],
-            "structural": ["structural", "structure"],
-            "electrical": ["electrical", "electrics"],
-            "autocad": ["autocad", "cad"],
-            "preparation": ["preparation", "prepared"]
-        }
-        
-        for key, variants in keywords.items():
-            if any(v in task_lower for v in variants):
-                if any(v in task_history for v in variants):
-                    relevant_tasks.append(f"Previous {key} work")
-                if any(v in special_tasks for v in variants):
-                    relevant_tasks.append(f"Specialized in {key}")
+        # Check for relevant keywords (only the groups the task itself mentions)
+        for key in self._task_relevance_groups(task):
+            if key in history_groups:
+                relevant_tasks.append(f"Previous {key} work")
+            if key in special_groups:
+                relevant_tasks.append(f"Specialized in {key}")
         
         return " | ".join(relevant_tasks[:2]) if relevant_tasks else "New task type"
     
-    def _extract_task_keywords(self, task_description: str) -> set:
+    @staticmethod
+    @lru_cache(maxsize=TASK_KEYWORD_CACHE_SIZE)
+    def _task_relevance_groups(task: str) -> tuple:
+        """TASK_RELEVANCE_KEYWORDS labels mentioned in the task description"""
+        return _relevance_groups(task.lower())
+    
+    @staticmethod
+    @lru_cache(maxsize=TASK_KEYWORD_CACHE_SIZE)
+    def _extract_task_keywords(task_description: str) -> frozenset:
         """Extract relevant keywords from task description"""
         task_lower = task_description.lower()
         
         keywords = set()
         
-        # Structural design keywords
-        structural_keywords = ["structural", "structure", "steel", "building", "rafter", 
-                              "foundation", "column", "truss", "roof", "concrete", 
-                              "beam", "load", "cad", "drawing"]
-        
-        # Electrical design keywords
-        electrical_keywords = ["electrical", "pv", "solar", "photovoltaic", "inverter",
-                              "string", "earthing", "cable", "switchgear", "panel"]
-        
-        # Coordination keywords
-        coordination_keywords = ["coordination", "coordinate", "coordinating"]
-        
-        for kw in structural_keywords:
-            if kw in task_lower:
-                keywords.add("structural")
-                keywords.add(kw)
-        
-        for kw in electrical_keywords:
-            if kw in task_lower:
-                keywords.add("electrical")
-                keywords.add(kw)
-        
-        for kw in coordination_keywords:
-            if kw in task_lower:
-                keywords.add("coordination")
-                keywords.add(kw)
+        for group, group_keywords in TASK_KEYWORD_GROUPS:
+            hits = [kw for kw in group_keywords if kw in task_lower]
+            if hits:
+                keywords.add(group)
+                keywords.update(hits)
         
         # Add generic design keyword
         if "design" in task_lower:
             keywords.add("design")
         
-        return keywords
+        return frozenset(keywords)
     
-    def _calculate_keyword_score(self, employee: dict, task_keywords: set, task_description: str) -> float:
+    @staticmethod
+    def _keyword_score_key(skills: Optional[Dict]) -> Optional[tuple]:
+        """Order-independent key of the skills _calculate_keyword_score reads; None if not hashable"""
+        try:
+            return tuple(tuple(sorted((skills or {}).get(category) or ())) for category in KEYWORD_SCORE_CATEGORIES)
+        except (TypeError, AttributeError):
+            return None
+    
+    def _calculate_keyword_score(self, employee: dict, task_keywords: frozenset, task_description: str) -> float:
         """Calculate skill match score based on keyword matching"""
         
         if not task_keywords:
             return 0.0
         
         # Prefer normalized skills (from raw_technical_skills/raw_strength_expertise).
-        skills = self.skill_normalizer.normalize_employee_skills(employee) or {}
+        skills = self._normalized_skills(employee) or {}
         task_lower = task_description.lower()
         
         score = 0.0
         matches = 0
         
-        # Check structural design skills
-        if "structural" in task_keywords or "design" in task_keywords:
-            structural_skills = skills.get("structural_design", [])
-            if structural_skills:
-                # Check for specific skill matches
-                for skill in structural_skills:
-                    skill_lower = skill.lower()
-                    if any(kw in skill_lower for kw in task_keywords):
-                        matches += 1
-                        score += 0.15
-                    elif "structural" in task_lower and "structural" in skill_lower:
-                        matches += 1
-                        score += 0.2
-                    elif "design" in task_lower and "design" in skill_lower:
-                        matches += 1
-                        score += 0.1
-        
-        # Check electrical design skills
-        if "electrical" in task_keywords or "solar" in task_keywords or "pv" in task_keywords:
-            electrical_skills = skills.get("electrical_design", [])
-            if electrical_skills:
-                for skill in electrical_skills:
-                    skill_lower = skill.lower()
-                    if any(kw in skill_lower for kw in task_keywords):
-                        matches += 1
-                        score += 0.15
-                    elif "electrical" in task_lower and "electrical" in skill_lower:
-                        matches += 1
-                        score += 0.2
-        
-        # Check coordination skills
-        if "coordination" in task_keywords:
-            coordination_skills = skills.get("coordination", [])
-            if coordination_skills:
-                for skill in coordination_skills:
-                    skill_lower = skill.lower()
-                    if "coordination" in skill_lower:
+        for category, triggers, any_keyword, fallbacks in KEYWORD_SCORE_RULES:
+            if triggers.isdisjoint(task_keywords):
+                continue
+            # Task-side conditions are fixed for the whole category
+            skill_words = [
+                (skill_word, weight) for task_word, skill_word, weight in fallbacks
+                if task_word is None or task_word in task_lower
+            ]
+            for skill in skills.get(category) or ():
+                skill_lower = skill.lower()
+                if any_keyword and any(kw in skill_lower for kw in task_keywords):
+                    matches += 1
+                    score += 0.15
+                    continue
+                for word, weight in skill_words:
+                    if word in skill_lower:
                         matches += 1
-                        score += 0.15
+                        score += weight
+                        break
         
         # Cap the score at 0.9 and ensure minimum if there are matches
         if matches > 0:
@@ -10,12 +10,23 @@ The normalization is additive and safe - it doesn't modify existing fields.
 """
 
 import logging
+import re
 from typing import Dict, List, Set, Any, Optional
 from app.core.settings import settings
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Patterns used by extract_keywords and _clean_skill_term
+WORD_RE = re.compile(r'\b[a-z]+\b')
+PUNCTUATION_RE = re.compile(r'[^\w\s-]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Heuristic hints (substring matches) for generic "design" text and for coordination
+STRUCTURAL_DESIGN_HINTS = ('structural', 'building', 'load', 'beam', 'column', 'truss')
+ELECTRICAL_DESIGN_HINTS = ('electrical', 'solar', 'pv', 'wire', 'conduit')
+COORDINATION_HINTS = ('coordination', 'coordinate', 'coordinating', 'management', 'team', 'leadership')
+
 class SkillNormalizer:
     """Normalizes and categorizes employee skills"""
     
@@ -62,6 +73,17 @@ class SkillNormalizer:
         'should', 'now', 'also', 'well', 'good', 'new', 'old', 'able'
     }
     
+    def __init__(self):
+        # Per category: (title-cased skill, words of the skill phrase). A skill matches when
+        # any of its words occurs in the employee text, so each distinct word is tested once.
+        self._skill_matchers = {
+            category: [(skill.title(), frozenset(skill.lower().split())) for skill in skills]
+            for category, skills in self.TECHNICAL_SKILLS_DB.items()
+        }
+        self._skill_words = frozenset(
+            word for matchers in self._skill_matchers.values() for _, words in matchers for word in words
+        )
+    
     def normalize_employee_skills(self, employee: Dict) -> Dict:
         """Normalize and categorize employee skills"""
         
@@ -79,45 +101,64 @@ class SkillNormalizer:
         all_text = f"{raw_skills} {raw_strength}".lower()
         
         # Extract and categorize skills
+        # (sets, so skills are de-duplicated as they are collected)
         categorized = {
-            'structural_design': [],
-            'electrical_design': [],
-            'coordination': [],
-            'quality_control': []  # Add QC category
+            'structural_design': set(),
+            'electrical_design': set(),
+            'coordination': set(),
+            'quality_control': set()  # Add QC category
         }
         
+        # Skill keywords present in the employee text (one substring scan per distinct word)
+        present_words = {word for word in self._skill_words if word in all_text}
+        
         # Check each skill category
-        for category, skills in self.TECHNICAL_SKILLS_DB.items():
-            if category == 'coordination_experience':
-                key = 'coordination'
-            else:
-                key = category.replace('_design', '_design').replace('_systems', '_systems').replace('_components', '_components').replace('_compliance', '_compliance').replace('_tools', '_tools')
-            
-            if key in categorized:
-                for skill in skills:
-                    # Check if skill keywords are in employee text
-                    skill_lower = skill.lower()
-                    if any(keyword in all_text for keyword in skill_lower.split()):
-                        categorized[key].append(skill.title())
+        for category, matchers in self._skill_matchers.items():
+            if category in categorized:
+                for skill_title, words in matchers:
+                    if not words.isdisjoint(present_words):
+                        categorized[category].add(skill_title)
         
         # Additional heuristic extraction for common patterns
         if 'design' in all_text and not categorized['structural_design'] and not categorized['electrical_design']:
             # If design is mentioned but no specific type, categorize based on other keywords
-            if any(word in all_text for word in ['structural', 'building', 'load', 'beam', 'column', 'truss']):
-                categorized['structural_design'].append('Design')
-            elif any(word in all_text for word in ['electrical', 'solar', 'pv', 'wire', 'conduit']):
-                categorized['electrical_design'].append('Design')
+            if any(word in all_text for word in STRUCTURAL_DESIGN_HINTS):
+                categorized['structural_design'].add('Design')
+            elif any(word in all_text for word in ELECTRICAL_DESIGN_HINTS):
+                categorized['electrical_design'].add('Design')
         
         # Extract coordination keywords
-        coordination_keywords = ['coordination', 'coordinate', 'coordinating', 'management', 'team', 'leadership']
-        if any(kw in all_text for kw in coordination_keywords) and not categorized['coordination']:
-            categorized['coordination'].append('Coordination')
+        # (only scanned when the skill pass found no coordination skill)
+        if not categorized['coordination'] and any(kw in all_text for kw in COORDINATION_HINTS):
+            categorized['coordination'].add('Coordination')
+        
+        return {key: list(skills) for key, skills in categorized.items()}
+    
+    def normalize_batch(self, employees: List[Dict]) -> List[Dict]:
+        """Normalize skills for many employees, in order.
         
-        # Remove duplicates
-        for key in categorized:
-            categorized[key] = list(set(categorized[key]))
+        Employees with the same raw skill text share one (read-only) result, so each
+        distinct text is normalized once.
+        """
+        results = []
+        by_text = {}
+        for employee in employees:
+            existing_skills = employee.get('technical_skills', {})
+            if isinstance(existing_skills, dict) and existing_skills:
+                results.append(existing_skills)
+                continue
+            
+            text_key = (employee.get('raw_technical_skills', '') or '', employee.get('raw_strength_expertise', '') or '')
+            try:
+                normalized = by_text.get(text_key)
+            except TypeError:  # non-string raw fields are not hashable
+                results.append(self.normalize_employee_skills(employee))
+                continue
+            if normalized is None:
+                normalized = by_text[text_key] = self.normalize_employee_skills(employee)
+            results.append(normalized)
         
-        return categorized
+        return results
     
     def extract_keywords(self, text: str) -> List[str]:
         """Extract relevant keywords from text"""
@@ -126,7 +167,7 @@ class SkillNormalizer:
             return []
         
         # Clean and split text
-        words = re.findall(r'\b[a-z]+\b', text.lower())
+        words = WORD_RE.findall(text.lower())
         
         # Remove filler words and short words
         keywords = [w for w in words if w not in self.FILLER_WORDS and len(w) > 2]
@@ -205,10 +246,10 @@ class SkillNormalizer:
             return ""
         
         # Remove common punctuation
-        term = re.sub(r'[^\w\s-]', ' ', term)
+        term = PUNCTUATION_RE.sub(' ', term)
         
         # Normalize whitespace
-        term = re.sub(r'\s+', ' ', term).strip()
+        term = WHITESPACE_RE.sub(' ', term).strip()
         
         # Remove leading/trailing common words
         words = term.split()
@@ -22,17 +22,6 @@ from app.services.cache_service import cached, get_cache
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-def convert_objectid_to_str(obj):
-    """Convert ObjectId to string recursively"""
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    elif isinstance(obj, dict):
-        return {key: convert_objectid_to_str(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_objectid_to_str(item) for item in obj]
-    else:
-        return obj
-
 
 def _parse_file_stage_history_safely(stage_doc: Dict) -> Optional[FileStageHistory]:
     """Safely parse FileStageHistory from raw dict, handling legacy data"""
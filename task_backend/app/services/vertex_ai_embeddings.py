@@ -3,7 +3,11 @@ Vertex AI Gemini Embedding Service
 Generates embeddings for employee skills and task descriptions
 """
 import os
-from typing import List, Dict, Any, Optional
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 from google.cloud import aiplatform
 from vertexai.language_models import TextEmbeddingModel
@@ -14,6 +18,41 @@ from app.core.settings import settings
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Embeddings are deterministic per (model, text), so identical task descriptions
+# can reuse a previous vector instead of paying a Vertex AI round trip.
+EMBEDDING_CACHE_MAX_ENTRIES = 1024
+
+
+class EmbeddingCache:
+    """Thread-safe bounded LRU of embeddings keyed by (model_name, content hash)"""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, bytes], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name: str, text: str) -> Tuple[str, bytes]:
+        return model_name, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+            return embedding
+
+    def put(self, key: Tuple[str, bytes], embedding: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+# Shared by every service instance (the recommendation engine builds its own)
+_embedding_cache = EmbeddingCache()
+
 class VertexAIEmbeddingService:
     """Service for generating embeddings using Vertex AI Gemini
     
@@ -28,6 +67,7 @@ class VertexAIEmbeddingService:
     def __init__(self):
         self.initialized = False
         self.model = None
+        self.model_name = None
         self.embedding_dimension = 768  # text-embedding-004 dimension
         # Note: No thinking/reasoning parameters - this is a direct embedding model
         
@@ -55,6 +95,7 @@ class VertexAIEmbeddingService:
                 # Load embedding model
                 model_name = settings.vertex_ai_embedding_model_name
                 self.model = TextEmbeddingModel.from_pretrained(model_name)
+                self.model_name = model_name
                 
                 self.initialized = True
                 print(f"✅ Vertex AI initialized with model: {model_name}")
@@ -81,10 +122,16 @@ class VertexAIEmbeddingService:
         if not self.initialized or not self.model:
             return self._mock_embedding(text)
         
+        cache_key = _embedding_cache.key(self.model_name, text)
+        cached = _embedding_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # Direct embedding generation (NO thinking, NO reasoning)
             embeddings = self.model.get_embeddings([text])
             if embeddings and len(embeddings) > 0:
+                _embedding_cache.put(cache_key, embeddings[0].values)
                 return embeddings[0].values
             else:
                 return self._mock_embedding(text)
@@ -92,15 +139,30 @@ class VertexAIEmbeddingService:
             print(f"❌ Error generating embedding: {e}")
             return self._mock_embedding(text)
     
+    async def generate_embedding_async(self, text: str) -> List[float]:
+        """Generate an embedding from async code without blocking the event loop"""
+        if self.initialized and self.model:
+            cached = _embedding_cache.get(_embedding_cache.key(self.model_name, text))
+            if cached is not None:
+                return cached
+        return await asyncio.to_thread(self.generate_embedding, text)
+    
     def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for multiple texts"""
         if not self.initialized or not self.model:
             return [self._mock_embedding(text) for text in texts]
         
         try:
-            # Vertex AI supports batch processing
-            embeddings = self.model.get_embeddings(texts)
-            return [emb.values for emb in embeddings]
+            # Only texts not already cached go to Vertex AI, in a single request
+            cache_keys = [_embedding_cache.key(self.model_name, text) for text in texts]
+            results = [_embedding_cache.get(key) for key in cache_keys]
+            missing = [i for i, embedding in enumerate(results) if embedding is None]
+            if missing:
+                embeddings = self.model.get_embeddings([texts[i] for i in missing])
+                for i, emb in zip(missing, embeddings):
+                    _embedding_cache.put(cache_keys[i], emb.values)
+                    results[i] = emb.values
+            return results
         except Exception as e:
             print(f"❌ Error generating batch embeddings: {e}")
             return [self._mock_embedding(text) for text in texts]
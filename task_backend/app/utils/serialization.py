@@ -0,0 +1,25 @@
+"""
+Serialization helpers shared by models, services and routers
+"""
+from typing import Any
+
+from bson import ObjectId
+
+
+def convert_objectid_to_str(obj: Any) -> Any:
+    """Convert ObjectId to string recursively"""
+    obj_type = type(obj)
+    if obj_type is dict:
+        return {key: convert_objectid_to_str(value) for key, value in obj.items()}
+    if obj_type is list:
+        return [convert_objectid_to_str(item) for item in obj]
+    if obj_type is ObjectId:
+        return str(obj)
+    # Subclasses (OrderedDict, SON, ...) take the slower isinstance path
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, dict):
+        return {key: convert_objectid_to_str(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [convert_objectid_to_str(item) for item in obj]
+    return obj
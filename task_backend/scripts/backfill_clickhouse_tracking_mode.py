@@ -75,12 +75,14 @@ def backfill_tracking_mode():
         logger.info("This may take a few minutes for large datasets...")
         
         try:
+            # mutations_sync=2 waits until the mutation is applied on every replica, so the
+            # verification below reads the updated values without forcing a merge
             # Update records with empty file_id to STANDALONE
             clickhouse_service.client.execute("""
                 ALTER TABLE task_events 
                 UPDATE tracking_mode = 'STANDALONE'
                 WHERE file_id = '' OR file_id IS NULL
-            """)
+            """, settings={'mutations_sync': 2})
             logger.info("✅ Updated STANDALONE tasks (empty file_id)")
             
             # Update records with file_id to FILE_BASED
@@ -88,23 +90,15 @@ def backfill_tracking_mode():
                 ALTER TABLE task_events 
                 UPDATE tracking_mode = 'FILE_BASED'
                 WHERE file_id != '' AND file_id IS NOT NULL
-            """)
+            """, settings={'mutations_sync': 2})
             logger.info("✅ Updated FILE_BASED tasks (with file_id)")
             
         except Exception as e:
             logger.error(f"Failed to update tracking_mode: {e}")
             return False
         
-        # Step 5: Optimize table to apply mutations
-        logger.info("\n[Step 5] Optimizing table to apply mutations...")
-        try:
-            clickhouse_service.client.execute("OPTIMIZE TABLE task_events FINAL")
-            logger.info("✅ Table optimized")
-        except Exception as e:
-            logger.warning(f"Failed to optimize table (non-critical): {e}")
-        
-        # Step 6: Verify results
-        logger.info("\n[Step 6] Verifying backfill results...")
+        # Step 5: Verify results
+        logger.info("\n[Step 5] Verifying backfill results...")
         try:
             result = clickhouse_service.client.execute("""
                 SELECT 
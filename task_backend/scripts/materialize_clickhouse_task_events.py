@@ -0,0 +1,105 @@
+"""
+ClickHouse Migration Script - Materialize task_events Derived Data
+Builds skip indexes and rollups declared by ClickHouseService._ensure_tables for
+data written before they existed (new inserts maintain them automatically)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Each MATERIALIZE runs as a background mutation rewriting existing parts
+MATERIALIZE_STATEMENTS = [
+    "ALTER TABLE task_events MATERIALIZE INDEX idx_event_type",
+]
+
+
+# (rollup table, materialized view, name of its SELECT template in clickhouse_service)
+ROLLUP_BACKFILLS = [
+    ('employee_stage_daily', 'employee_stage_daily_mv', 'EMPLOYEE_STAGE_DAILY_SELECT_TEMPLATE'),
+    ('task_stage_daily', 'task_stage_daily_mv', 'TASK_STAGE_DAILY_SELECT_TEMPLATE'),
+    ('task_events_latest', 'task_events_latest_mv', 'TASK_EVENTS_LATEST_SELECT_TEMPLATE'),
+]
+
+
+def backfill_rollup(client, table: str, view: str, template_name: str) -> bool:
+    """Aggregate task_events rows inserted before the rollup's materialized view was created"""
+    from app.services import clickhouse_service as clickhouse_module
+    
+    result = client.execute("""
+        SELECT metadata_modification_time
+        FROM system.tables
+        WHERE database = currentDatabase() AND name = %(view)s
+    """, {'view': view})
+    if not result:
+        logger.error(f"{view} does not exist - start the backend once to create it")
+        return False
+    
+    # Rows created after this point were already aggregated by the view
+    cutoff = result[0][0]
+    logger.info(f"Backfilling {table} from task_events created before {cutoff}...")
+    client.execute(
+        f"INSERT INTO {table} " + getattr(clickhouse_module, template_name).format(
+            extra_conditions="AND created_at < %(cutoff)s"
+        ),
+        {'cutoff': cutoff}
+    )
+    logger.info(f"✅ Backfilled {table}")
+    return True
+
+
+def materialize_task_events():
+    """Materialize task_events indexes and rollups for existing data"""
+    
+    try:
+        from app.services.clickhouse_service import clickhouse_service, CLICKHOUSE_ENABLED
+        
+        if not CLICKHOUSE_ENABLED or clickhouse_service.client is None:
+            logger.error("ClickHouse is disabled or unreachable. Please enable it before running the migration.")
+            return False
+        
+        logger.info("="*80)
+        logger.info("ClickHouse Migration Script - Materialize task_events Derived Data")
+        logger.info("="*80)
+        
+        for statement in MATERIALIZE_STATEMENTS:
+            logger.info(f"Running: {statement}")
+            try:
+                clickhouse_service.client.execute(statement)
+                logger.info("✅ Mutation scheduled")
+            except Exception as e:
+                logger.error(f"Failed: {e}")
+                return False
+        
+        if '--backfill-rollups' in sys.argv:
+            for table, view, template_name in ROLLUP_BACKFILLS:
+                try:
+                    if not backfill_rollup(clickhouse_service.client, table, view, template_name):
+                        return False
+                except Exception as e:
+                    logger.error(f"Failed to backfill {table}: {e}")
+                    return False
+        else:
+            logger.info("Skipping rollup backfill (run once with --backfill-rollups)")
+        
+        logger.info("\n" + "="*80)
+        logger.info("🎉 Mutations scheduled - progress is visible in system.mutations")
+        logger.info("="*80)
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = materialize_task_events()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,90 @@
+"""
+ClickHouse Migration Script - LowCardinality String Columns
+Converts low-distinct-value String columns (stages, statuses, event types) of
+existing tables to LowCardinality, matching the DDL used for new tables
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# (table, column, target type). Sorting-key columns (e.g. file_lifecycle_events.event_type,
+# task_events.stage/event_type) cannot be modified in place and are only LowCardinality
+# for newly created tables.
+COLUMN_MIGRATIONS = [
+    ('task_events', 'status', 'LowCardinality(String)'),
+    ('task_events', 'stage_original', 'LowCardinality(String)'),
+    ('task_events', 'tracking_mode', 'LowCardinality(String)'),
+    ('file_lifecycle_events', 'stage', 'LowCardinality(String)'),
+    ('file_lifecycle_events', 'previous_stage', 'LowCardinality(Nullable(String))'),
+    ('file_lifecycle_events', 'next_stage', 'LowCardinality(Nullable(String))'),
+    ('file_current_state', 'current_stage', 'LowCardinality(String)'),
+    ('file_current_state', 'current_status', 'LowCardinality(String)'),
+    ('file_lifecycle', 'current_stage', 'LowCardinality(String)'),
+    ('file_lifecycle', 'current_status', 'LowCardinality(String)'),
+]
+
+
+def migrate_lowcardinality_columns():
+    """Convert the configured columns to their LowCardinality types"""
+    
+    try:
+        from app.services.clickhouse_service import clickhouse_service, CLICKHOUSE_ENABLED
+        
+        if not CLICKHOUSE_ENABLED or clickhouse_service.client is None:
+            logger.error("ClickHouse is disabled or unreachable. Please enable it before running the migration.")
+            return False
+        
+        logger.info("="*80)
+        logger.info("ClickHouse Migration Script - LowCardinality Columns")
+        logger.info("="*80)
+        
+        current_types = {
+            (table, name): column_type
+            for table, name, column_type in clickhouse_service.client.execute("""
+                SELECT table, name, type
+                FROM system.columns
+                WHERE database = currentDatabase()
+            """)
+        }
+        
+        for table, column, target_type in COLUMN_MIGRATIONS:
+            current_type = current_types.get((table, column))
+            if current_type is None:
+                logger.warning(f"⚠️  {table}.{column} does not exist, skipping")
+                continue
+            if current_type == target_type:
+                logger.info(f"✅ {table}.{column} is already {target_type}")
+                continue
+            
+            logger.info(f"Converting {table}.{column}: {current_type} -> {target_type}...")
+            try:
+                clickhouse_service.client.execute(
+                    f"ALTER TABLE {table} MODIFY COLUMN {column} {target_type}"
+                )
+                logger.info(f"✅ Converted {table}.{column}")
+            except Exception as e:
+                logger.error(f"Failed to convert {table}.{column}: {e}")
+                return False
+        
+        logger.info("\n" + "="*80)
+        logger.info("🎉 Migration completed successfully!")
+        logger.info("="*80)
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = migrate_lowcardinality_columns()
+    sys.exit(0 if success else 1)